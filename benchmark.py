@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+#
+# benchmark.py
+#
+# VERSION: 0.5.0-dev
+#
+# LAST EDIT: 2026-10-17
+#
+###############################################################################
+# PUBLIC DOMAIN NOTICE                                                        #
+###############################################################################
+# This software is freely available to the public for use.                    #
+#                                                                             #
+# Although all reasonable efforts have been taken to ensure the accuracy and  #
+# reliability of the software, the author does not and cannot warrant the     #
+# performance or results that may be obtained by using this software.         #
+# The author disclaims all warranties, express or implied, including          #
+# warranties of performance, merchantability or fitness for any particular    #
+# purpose.                                                                    #
+#                                                                             #
+# Please cite the author in any work or product based on this material.       #
+#    Tyler W. Davis                                                           #
+###############################################################################
+#
+###############################################################################
+# REQUIRED MODULES:
+###############################################################################
+import json
+import os
+import tempfile
+import time
+
+import numpy
+
+import idf
+
+
+###############################################################################
+# FUNCTIONS:
+###############################################################################
+def make_synthetic_rainfall(years=10, resolution=5, wet_fraction=0.05,
+                            storm_length=60, irregular=0.0, seed=None):
+    """
+    Name:     make_synthetic_rainfall
+    Input:    - float, record length, years (years)
+              - float, time between samples, minutes (resolution)
+              - float, fraction of wet samples (wet_fraction)
+              - float, mean storm length, minutes (storm_length)
+              - float, fraction of samples dropped and jittered to make an
+                irregular time series (irregular)
+              - [optional] int, random seed (seed)
+    Output:   numpy.ndarray, rainfall time series (see idf.RAIN_DTYPE)
+    Features: Returns a synthetic rainfall record of alternating storms and
+              dry spells with geometrically distributed lengths; each wet
+              sample holds a geometrically distributed number of 0.01 in
+              tips
+    """
+    rng = numpy.random.default_rng(seed)
+    step = int(round(resolution*60))
+    num_samples = int(years*365.25*86400//step)
+
+    # Alternating storm and dry spell lengths (samples):
+    mean_wet = max(storm_length*60.0/step, 1.0)
+    mean_dry = max(mean_wet*(1.0 - wet_fraction)/wet_fraction, 1.0)
+    num_storms = int(num_samples/(mean_wet + mean_dry)) + 2
+    spells = numpy.empty(2*num_storms, dtype=numpy.int64)
+    spells[0::2] = rng.geometric(1.0/mean_dry, num_storms)
+    spells[1::2] = rng.geometric(1.0/mean_wet, num_storms)
+    edges = numpy.cumsum(spells)
+    edges = edges[edges < num_samples]
+
+    # Flip between dry and wet at each spell edge:
+    flips = numpy.zeros(num_samples + 1, dtype=numpy.int8)
+    flips[edges] = 1
+    is_wet = (numpy.cumsum(flips[:-1]) % 2).astype(bool)
+
+    my_data = numpy.zeros(num_samples, dtype=idf.RAIN_DTYPE)
+    my_data['timestamps'] = numpy.datetime64('2000-01-01T00:00:00', 's')
+    my_data['timestamps'] += step*numpy.arange(num_samples)
+    my_data['rain'][is_wet] = 0.01*(
+        1 + rng.geometric(1.0/3.0, numpy.count_nonzero(is_wet)))
+
+    if irregular > 0:
+        # Drop samples and jitter the rest within their sampling interval:
+        keep = rng.random(num_samples) >= irregular
+        keep[0] = True
+        my_data = my_data[keep]
+        jitter = rng.integers(0, max(step//2, 1), len(my_data))
+        jitter[0] = 0
+        my_data['timestamps'] += jitter
+
+    return my_data
+
+
+def run_benchmark(data, csv_file, repeat=3, mit=idf.MIT,
+                  durations=idf.DURATIONS, return_periods=idf.RETURN_PERIODS,
+                  plot_dir=None):
+    """
+    Name:     run_benchmark
+    Input:    - numpy.ndarray, rainfall time series (data)
+              - str, CSV file of the rainfall time series (csv_file)
+              - int, number of times each stage is run (repeat)
+              - float, minimum inter-event time, hours (mit)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - [optional] str, directory for the IDF plot (plot_dir)
+    Output:   list, dictionaries of stage timings
+    Features: Times each stage of the IDF pipeline, returning the best and
+              median wall times of each stage with its throughput; where
+              Numba is installed, the duration maxima are also timed with the
+              compiled kernel, which must match the NumPy result
+    """
+    num_rows = len(data)
+    stages = []
+
+    def time_stage(name, func, num_items):
+        my_times = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            my_result = func()
+            my_times.append(time.perf_counter() - t0)
+        stages.append({
+            'stage': name,
+            'items': num_items,
+            'best_s': min(my_times),
+            'median_s': float(numpy.median(my_times)),
+            'items_per_s': num_items/max(min(my_times), 1e-9),
+        })
+        return my_result
+
+    # The legacy timestamp parser is timed on a sample of the lines:
+    with open(csv_file, 'r') as f:
+        f.readline()
+        my_lines = [f.readline()[:16].encode('utf-8')
+                    for i in range(min(num_rows, 100000))]
+    time_stage('string_to_date',
+               lambda: [idf.string_to_date(x) for x in my_lines],
+               len(my_lines))
+
+    my_data = time_stage('read_rainfall',
+                         lambda: idf.read_rainfall(csv_file), num_rows)
+    my_data = time_stage('make_regular_ts',
+                         lambda: idf.make_regular_ts(my_data), num_rows)
+    num_rows = len(my_data)
+
+    seconds = idf.to_seconds(my_data['timestamps'])
+    events = time_stage(
+        'find_events',
+        lambda: idf.find_events(seconds, my_data['rain'], mit), num_rows)
+    if len(events) == 0:
+        raise ValueError("Error! No rain events found!")
+
+    cum_rain = idf.cumulative_rain(my_data['rain'])
+    use_jit = idf.USE_JIT
+    try:
+        idf.USE_JIT = False
+        maxima = time_stage(
+            'calc_duration_maxima',
+            lambda: idf.calc_duration_maxima(seconds, cum_rain, events,
+                                             durations),
+            len(events))
+
+        idf.USE_JIT = True
+        if idf.get_jit_kernels() is not None:
+            # Both backends must agree (the first call compiles the kernel):
+            jit_maxima = idf.calc_duration_maxima(
+                seconds, cum_rain, events, durations)
+            if not numpy.array_equal(maxima, jit_maxima):
+                raise ValueError("Error! Numba and NumPy maxima differ!")
+            time_stage(
+                'calc_duration_maxima_jit',
+                lambda: idf.calc_duration_maxima(seconds, cum_rain, events,
+                                                 durations),
+                len(events))
+    finally:
+        idf.USE_JIT = use_jit
+    my_idf = time_stage(
+        'calc_idf',
+        lambda: idf.calc_idf(maxima, durations, return_periods), len(events))
+
+    # The plot is saved (Agg backend) in a scratch directory:
+    my_cwd = os.getcwd()
+    my_labels = ["%g-yr" % (t) for t in return_periods]
+    plt = idf.get_pyplot(headless=True)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(plot_dir or temp_dir)
+        try:
+            time_stage(
+                'make_plot',
+                lambda: (idf.make_plot(my_idf, numpy.array(durations),
+                                       my_labels, True), plt.close('all')),
+                1)
+        finally:
+            os.chdir(my_cwd)
+
+    return stages
+
+
+def write_rainfall_csv(data, csv_file, chunk_size=idf.CHUNK_SIZE):
+    """
+    Name:     write_rainfall_csv
+    Input:    - numpy.ndarray, rainfall time series (data)
+              - str, output file name (csv_file)
+              - int, number of lines per chunk (chunk_size)
+    Output:   None
+    Features: Writes a rainfall time series to a two-column CSV file with
+              header, in the format read by idf.read_rainfall
+    """
+    with open(csv_file, 'w') as f:
+        f.write("datetime,rainfall\n")
+        for i in range(0, len(data), chunk_size):
+            my_chunk = data[i:i + chunk_size]
+            my_lines = numpy.char.add(
+                numpy.datetime_as_string(my_chunk['timestamps'], unit='s'),
+                numpy.char.mod(",%.2f\n", my_chunk['rain']))
+            f.write("".join(my_lines.tolist()).replace("T", " "))
+
+
+###############################################################################
+# MAIN:
+###############################################################################
+if __name__ == '__main__':
+    import argparse
+
+    p = argparse.ArgumentParser(
+        description="Times each stage of the IDF pipeline on synthetic rainfall")
+    p.add_argument("--years", type=float, default=10, help="record length, years (default: %(default)g)")
+    p.add_argument("--resolution", type=float, default=5, help="time between samples, minutes (default: %(default)g)")
+    p.add_argument("--wet_fraction", type=float, default=0.05, help="fraction of wet samples (default: %(default)g)")
+    p.add_argument("--storm_length", type=float, default=60, help="mean storm length, minutes (default: %(default)g)")
+    p.add_argument("--irregular", type=float, default=0.0, help="fraction of samples dropped and jittered for irregular timestamps (default: %(default)g)")
+    p.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)d)")
+    p.add_argument("--repeat", type=int, default=3, help="number of runs of each stage (default: %(default)d)")
+    p.add_argument("--csv", help="keep the synthetic rainfall in this CSV file")
+    p.add_argument("--json", help="save the timings to this JSON file")
+    args = p.parse_args()
+
+    data = make_synthetic_rainfall(args.years, args.resolution,
+                                   args.wet_fraction, args.storm_length,
+                                   args.irregular, args.seed)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_file = args.csv or os.path.join(temp_dir, "synthetic.csv")
+        write_rainfall_csv(data, csv_file)
+        stages = run_benchmark(data, csv_file, args.repeat)
+
+    print("%-26s %12s %10s %10s %14s" % (
+        "stage", "items", "best (s)", "median (s)", "items/s"))
+    for my_stage in stages:
+        print("%-26s %12d %10.4f %10.4f %14.0f" % (
+            my_stage['stage'], my_stage['items'], my_stage['best_s'],
+            my_stage['median_s'], my_stage['items_per_s']))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'stages': stages}, f, indent=2)
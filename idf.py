@@ -2,9 +2,9 @@
 #
 # idf.py
 #
-# VERSION: 0.4.3
+# VERSION: 0.5.0-dev
 #
-# LAST EDIT: 2019-11-28
+# LAST EDIT: 2026-10-17
 #
 ###############################################################################
 # PUBLIC DOMAIN NOTICE                                                        #
@@ -30,28 +30,1578 @@
 ###############################################################################
 # REQUIRED MODULES:
 ###############################################################################
-from copy import copy  # used in exec functions
+import contextlib
 import datetime
+import glob
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
 import os.path
+import re
+import sys
+import threading
+import time
+import tracemalloc
 
 import numpy
-import scipy.stats
-import matplotlib
 
-# Address issues with backend: (source: Rolf of Saxony on stackoverflow)
-for gui in matplotlib.rcsetup.interactive_bk:
-    try:
-        matplotlib.use(gui, warn=False, force=True)
-        from matplotlib import pyplot as plt
-        break
-    except:
-        continue
-print("Using:",matplotlib.get_backend())
+
+###############################################################################
+# GLOBAL VARIABLES:
+###############################################################################
+# Minimum inter-event time (MIT), hours:
+MIT = 5
+
+# Durations (min) for IDF analysis:
+DURATIONS = [5, 15, 30, 60, 120, 180, 720, 1440]
+
+# Return periods (yr) for computing the IDF curve:
+RETURN_PERIODS = [2, 5, 10, 25, 50, 100]
+
+# Rain event table fields:
+#   start ...... index of the dry sample preceding the event
+#   end ........ index of the dry sample following the event
+#   duration ... storm duration (hours)
+#   total ...... total rainfall amount (inches)
+EVENT_DTYPE = numpy.dtype({'names': ('start', 'end', 'duration', 'total'),
+                           'formats': ('i8', 'i8', 'f8', 'f8')})
+
+# Rainfall time series fields:
+RAIN_DTYPE = numpy.dtype({'names': ('timestamps', 'rain'),
+                          'formats': ('M8[s]', 'f8')})
+
+# Number of lines parsed at a time when reading rainfall files:
+CHUNK_SIZE = 1000000
+
+# Default size limit for the rainfall cache directory (bytes):
+CACHE_SIZE = 2**30
+
+# Character translation for parsing rainfall files (see parse_rainfall_lines):
+PARSE_TABLE = str.maketrans('-/:,T\r\x00', '      -')
+
+# Use the Numba-compiled kernels when Numba is installed (see get_jit_kernels):
+USE_JIT = True
+
+# Compiled kernels, filled on first use:
+JIT_KERNELS = {}
 
 
 ###############################################################################
 # FUNCTIONS:
 ###############################################################################
+def bootstrap_idf(maxima, durations=DURATIONS, return_periods=RETURN_PERIODS,
+                  num_boot=100, seed=None, block_size=2**20):
+    """
+    Name:     bootstrap_idf
+    Input:    - numpy.ndarray, event maxima for each duration (maxima)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - int, number of bootstrap replicates (num_boot)
+              - [optional] int or numpy.random.SeedSequence, seed (seed)
+              - int, maximum number of resampled maxima per block
+                (block_size)
+    Output:   numpy.ndarray, IDF matrices (replicates x durations x return
+              periods)
+    Features: Returns the IDF matrices of bootstrap replicates, each drawn by
+              resampling the events (with replacement) of the event maxima
+    Depends:  calc_idf
+    """
+    maxima = numpy.asarray(maxima, dtype=numpy.float64)
+    num_events, num_durs = maxima.shape
+    rng = numpy.random.default_rng(seed)
+    idf_boot = numpy.zeros((num_boot, num_durs, len(return_periods)))
+
+    # Process the replicates in blocks to bound the memory footprint:
+    step = max(1, block_size//max(1, num_events*num_durs))
+    for i in range(0, num_boot, step):
+        j = min(i + step, num_boot)
+        my_idx = rng.integers(0, num_events, size=(j - i, num_events))
+
+        # Resampled maxima as an (events x replicates*durations) matrix:
+        my_maxima = maxima[my_idx].transpose(1, 0, 2).reshape(
+            num_events, (j - i)*num_durs)
+        idf_boot[i:j] = calc_idf(
+            my_maxima, numpy.tile(durations, j - i), return_periods).reshape(
+                j - i, num_durs, len(return_periods))
+
+    return idf_boot
+
+
+def calc_annual_maxima(timestamps, cum_rain, durations=DURATIONS):
+    """
+    Name:     calc_annual_maxima
+    Input:    - numpy.ndarray, timestamps (timestamps)
+              - numpy.ndarray, cumulative rainfall (cum_rain)
+              - list, durations, minutes (durations)
+    Output:   tuple, table of the years (see EVENT_DTYPE) and the (years x
+              durations) matrix of their maximum rainfall
+    Features: Returns the annual maximum series of each duration without
+              finding the rain events: the moving window sums (see
+              iter_window_sums) are grouped by the year of their first
+              sample; as moving a window's start past a sample that adds no
+              rainfall never decreases its total (unless the window then
+              holds no rainfall), only the windows starting where rainfall
+              accumulates, the sample before, or at the last sample of a
+              year, are searched
+    Depends:  - iter_window_sums
+              - to_seconds
+    """
+    seconds = to_seconds(timestamps)
+
+    # First sample of each year (on record):
+    my_years = numpy.arange(
+        numpy.datetime64(timestamps[0], 'Y'),
+        numpy.datetime64(timestamps[-1], 'Y') + 1)
+    firsts = numpy.unique(numpy.searchsorted(
+        seconds, to_seconds(my_years.astype('datetime64[s]'))))
+    firsts = firsts[firsts < len(seconds)]
+
+    win_start = numpy.zeros(len(seconds), dtype=bool)
+    numpy.greater(cum_rain[1:], cum_rain[:-1], out=win_start[:-1])
+    win_start[:-1] |= win_start[1:]
+    win_start[numpy.append(firsts[1:], len(seconds)) - 1] = True
+    win_start = numpy.flatnonzero(win_start)
+    maxima = numpy.zeros((len(firsts), len(durations)))
+    for n, my_sums in iter_window_sums(seconds, cum_rain, durations,
+                                       win_start):
+        maxima[:, n] = numpy.maximum.reduceat(
+            my_sums, numpy.searchsorted(win_start, firsts))
+
+    years = numpy.zeros(len(firsts), dtype=EVENT_DTYPE)
+    years['start'] = firsts
+    years['end'] = numpy.append(firsts[1:], len(seconds) - 1)
+    years['duration'] = (seconds[years['end']] - seconds[firsts])/3600.0
+    years['total'] = cum_rain[years['end']] - cum_rain[firsts]
+
+    return (years, maxima)
+
+
+def calc_duration_maxima(timestamps, cum_rain, events, durations,
+                         is_rate=False, block_size=2**20):
+    """
+    Name:     calc_duration_maxima
+    Input:    - numpy.ndarray, timestamps (timestamps)
+              - numpy.ndarray, cumulative rainfall (cum_rain)
+              - numpy.ndarray, event table (events)
+              - list, durations, minutes (durations)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - int, maximum number of moving windows per block (block_size)
+    Output:   numpy.ndarray, maximum rainfall for each event and duration
+    Features: Returns the (events x durations) matrix of the maximum rainfall
+              found in a moving window of each duration; events that are no
+              longer than a duration are assigned their total rainfall
+    Depends:  - calc_window_maxima
+              - get_jit_kernels
+              - to_seconds
+    """
+    seconds = to_seconds(timestamps)
+    durations = numpy.asarray(durations, dtype=numpy.float64)
+    totals = cum_rain[events['end']] - cum_rain[events['start']]
+    maxima = numpy.repeat(totals[:, None], len(durations), axis=1)
+    if len(events) == 0 or len(durations) == 0:
+        return maxima
+
+    # Move a window through each event starting at each sample but the last
+    # two (for rates, but the dry samples between two dry ones; see
+    # calc_window_maxima). The window ends at the first sample more than the
+    # duration past its start, or at the event's ending dry sample,
+    # whichever comes first (excluded from the window total). Only events
+    # longer than a duration are searched:
+    long_events = (
+        (events['duration'] > durations.min()/60.0) &
+        (events['end'] - events['start'] > 1))
+
+    kernels = get_jit_kernels()
+    if kernels is not None:
+        # Scan each event's windows in place, durations in ascending order:
+        my_long = numpy.flatnonzero(long_events)
+        dur_order = numpy.argsort(durations, kind='stable')
+        my_durations = durations[dur_order]
+        my_maxima = maxima[numpy.ix_(my_long, dur_order)]
+        kernels['scan_window_maxima'](
+            seconds, cum_rain, events['start'][my_long],
+            events['end'][my_long],
+            numpy.searchsorted(my_durations/60.0,
+                               events['duration'][my_long], side='left'),
+            numpy.floor(my_durations*60.0).astype(numpy.int64), is_rate,
+            my_maxima)
+        maxima[numpy.ix_(my_long, dur_order)] = my_maxima
+        return maxima
+
+    # Where an event is regularly sampled, a window's end is found by
+    # counting samples rather than by searching the timestamps:
+    deltas = numpy.diff(seconds)
+    step = max(int(deltas.min()), 1) if len(deltas) > 0 else 1
+    num_irregular = numpy.zeros(len(seconds), dtype=numpy.int64)
+    numpy.cumsum(deltas != step, out=num_irregular[1:])
+    is_regular = (num_irregular[events['end']] ==
+                  num_irregular[events['start']])
+    for my_regular in (True, False):
+        my_long = numpy.flatnonzero(long_events & (is_regular == my_regular))
+        maxima[my_long] = calc_window_maxima(
+            seconds, cum_rain, events[my_long], durations, my_regular, step,
+            is_rate, block_size)
+
+    return maxima
+
+
+def calc_ecdf_quantiles(samples, probs, tol=1e-9):
+    """
+    Name:     calc_ecdf_quantiles
+    Input:    - numpy.ndarray, samples x groups (samples)
+              - numpy.ndarray, cumulative probabilities (probs)
+              - float, largest difference between tied samples (tol)
+    Output:   numpy.ndarray, quantiles (groups x probabilities)
+    Features: Returns the values of each column's empirical CDF at the given
+              cumulative probabilities, linearly interpolating between the
+              distinct sample values; samples within the tolerance of each
+              other are tied, so round-off in the rainfall sums does not
+              split ties; NaN samples are ignored, so columns may hold
+              different numbers of samples (columns without samples return
+              NaN)
+    """
+    samples = numpy.sort(numpy.asarray(samples, dtype=numpy.float64), axis=0)
+    probs = numpy.clip(numpy.asarray(probs, dtype=numpy.float64), 0.0, 1.0)
+    num_samples, num_groups = samples.shape
+    counts = numpy.count_nonzero(~numpy.isnan(samples), axis=0)
+
+    # The CDF of each distinct value is the fraction of samples no larger
+    # than it (i.e., the rank of its last occurrence in the sorted column):
+    ranks = numpy.arange(1, num_samples + 1)[:, None]
+    keep = ranks <= counts
+    keep[:-1] &= ~(samples[1:] - samples[:-1] <= tol)
+    my_groups, my_ranks = numpy.nonzero(keep.T)
+    my_vals = samples[my_ranks, my_groups]
+    my_cpf = (my_ranks + 1.0)/counts[my_groups]
+
+    # Interpolate every column in one call by shifting each column's CDF
+    # onto its own interval [2g, 2g + 1]; a leading point at 2g holds the
+    # smallest value for probabilities below the first CDF step:
+    firsts = numpy.flatnonzero(numpy.diff(my_groups, prepend=-1) != 0)
+    xp = numpy.concatenate((2.0*my_groups[firsts], 2.0*my_groups + my_cpf))
+    fp = numpy.concatenate((my_vals[firsts], my_vals))
+    order = numpy.argsort(xp, kind='stable')
+    x = probs[None, :] + 2.0*numpy.arange(num_groups)[:, None]
+    if len(xp):
+        quantiles = numpy.interp(x, xp[order], fp[order])
+    else:
+        quantiles = numpy.zeros(x.shape)
+    quantiles[counts == 0] = numpy.nan
+
+    return quantiles
+
+
+def calc_grid_idf(timestamps, cube, durations=DURATIONS,
+                  return_periods=RETURN_PERIODS, mit=MIT, is_rate=False,
+                  tile_size=None):
+    """
+    Name:     calc_grid_idf
+    Input:    - numpy.ndarray, timestamps (timestamps)
+              - numpy.ndarray, rainfall cube, time x rows [x columns]; may be
+                memory-mapped or a netCDF4 variable (cube)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - float, minimum inter-event time, hours (mit)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - [optional] int, number of cells per tile (tile_size)
+    Output:   tuple, IDF cube (cells x durations x return periods) and the
+              number of rain events of each cell
+    Features: Returns the IDF matrix of every grid cell, reading the cube in
+              tiles of at most tile_size cells (by default, about CHUNK_SIZE
+              samples); cells are numbered in row-major order, and a tile is
+              a block of whole rows or, if a row does not fit, of columns
+    Depends:  - calc_tile_idf
+              - to_seconds
+    """
+    seconds = to_seconds(timestamps)
+    if cube.ndim < 2 or cube.shape[0] != len(seconds):
+        raise ValueError("Error! Rainfall cube must be time x rows [x cols]!")
+    grid_shape = cube.shape[1:]
+    if tile_size is None:
+        tile_size = max(1, CHUNK_SIZE//max(len(seconds), 1))
+
+    # Tile along the first axis whose slices (e.g., rows) fit in a tile,
+    # taking one index at a time of the axes before it; tiles are then
+    # contiguous blocks of cells in row-major order:
+    k = 0
+    while int(numpy.prod(grid_shape[k + 1:])) > tile_size:
+        k += 1
+    slice_cells = max(int(numpy.prod(grid_shape[k + 1:])), 1)
+    tile_slices = tile_size//slice_cells
+
+    num_cells = int(numpy.prod(grid_shape))
+    idf = numpy.zeros((num_cells, len(durations), len(return_periods)))
+    num_events = numpy.zeros(num_cells, dtype=numpy.int64)
+    first_cell = 0
+    for my_index in numpy.ndindex(*grid_shape[:k]):
+        for j in range(0, grid_shape[k], tile_slices):
+            my_tile = cube[(slice(None),) + my_index +
+                           (slice(j, j + tile_slices),)]
+            if numpy.ma.isMaskedArray(my_tile):
+                my_tile = my_tile.astype(numpy.float64).filled(numpy.nan)
+            my_tile = numpy.asarray(my_tile, dtype=numpy.float64).reshape(
+                len(seconds), -1)
+            my_cells = slice(first_cell, first_cell + my_tile.shape[1])
+            idf[my_cells], num_events[my_cells] = calc_tile_idf(
+                seconds, my_tile, durations, return_periods, mit, is_rate)
+            first_cell += my_tile.shape[1]
+
+    return (idf, num_events)
+
+
+def calc_idc(maxima, durations=DURATIONS):
+    """
+    Name:     calc_idc
+    Input:    - numpy.ndarray, event maxima for each duration (maxima)
+              - list, durations, minutes (durations)
+    Output:   numpy.ndarray, intensity-duration matrix (3 x durations)
+    Features: Returns the intensity-duration matrix, where
+                row 1 = duration (min)
+                row 2 = max rainfall amount (in)
+                row 3 = associated rainfall intensity (in/hr)
+    """
+    idc = numpy.zeros(shape=(3, len(durations)))
+    idc[0] = durations
+    idc[1] = maxima.max(axis=0)
+    idc[2] = idc[1]/(idc[0]/60.0)
+    return idc
+
+
+def calc_idf(maxima, durations=DURATIONS, return_periods=RETURN_PERIODS):
+    """
+    Name:     calc_idf
+    Input:    - numpy.ndarray, event maxima for each duration (maxima)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+    Output:   numpy.ndarray, IDF matrix (durations x return periods)
+    Features: Returns the rainfall intensities (in/hr) for each duration and
+              return period based on the cumulative probability of the
+              event maxima
+    Depends:  calc_ecdf_quantiles
+    """
+    # IDF matrix:
+    # -------------------------------------------------------------------- #
+    #                               F R E Q U E N C Y
+    #                    2-yr   5-yr   10-yr   25-yr   50-yr   100-yr
+    # D     5-min ....                                               .....
+    # U    15-min ....                                               .....
+    # R    30-min ....       RAIN INTENSITIES CORRESPONDING          .....
+    # A    60-min ....             TO THE RETURN PERIOD              .....
+    # T   120-min ....                  PROBABILITY                  .....
+    # I   180-min ....                                               .....
+    # O   720-min ....                                               .....
+    # N  1440-min ....                                               .....
+    # -------------------------------------------------------------------- #
+    # CDF equivalents of the return periods:
+    myfreqs = 1.0 - 1.0/numpy.asarray(return_periods, dtype=numpy.float64)
+
+    # Calculate the rainfall intensity (in/hr) for each return period
+    # probability from the empirical CDF of each duration's maxima:
+    idf = calc_ecdf_quantiles(maxima, myfreqs)
+    idf *= 60.0/numpy.asarray(durations, dtype=numpy.float64)[:, None]
+
+    return idf
+
+
+def calc_idf_bands(maxima, durations=DURATIONS,
+                   return_periods=RETURN_PERIODS, num_boot=1000, ci=95.0,
+                   seed=None, workers=1, replicates_per_task=100):
+    """
+    Name:     calc_idf_bands
+    Input:    - numpy.ndarray, event maxima for each duration (maxima)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - int, number of bootstrap replicates (num_boot)
+              - float, confidence level, percent (ci)
+              - [optional] int, random seed (seed)
+              - [optional] int, number of worker processes (workers)
+              - int, number of replicates per task (replicates_per_task)
+    Output:   numpy.ndarray, lower and upper IDF matrices (2 x durations x
+              return periods)
+    Features: Returns the percentile confidence bands of the IDF matrix from
+              bootstrap replicates of the event maxima; the replicates are
+              split into tasks with independent seeds spawned from the seed,
+              so the bands do not depend on the number of workers
+    Depends:  bootstrap_idf
+    """
+    seeds = numpy.random.SeedSequence(seed).spawn(
+        -(-num_boot//replicates_per_task))
+    tasks = [(maxima, durations, return_periods,
+              min(replicates_per_task, num_boot - i*replicates_per_task),
+              my_seed) for i, my_seed in enumerate(seeds)]
+
+    if workers == 1:
+        idf_boot = [bootstrap_idf(*my_task) for my_task in tasks]
+    else:
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers) as pool:
+            idf_boot = list(pool.map(bootstrap_idf, *zip(*tasks)))
+
+    alpha = 0.5*(100.0 - ci)
+    return numpy.percentile(
+        numpy.concatenate(idf_boot), [alpha, 100.0 - alpha], axis=0)
+
+
+def calc_maxima_task(shm_names, num_samples, first, last, events, durations,
+                     is_rate=False, block_size=2**20):
+    """
+    Name:     calc_maxima_task
+    Input:    - tuple, shared memory names of the epoch seconds and the
+                cumulative rainfall (shm_names)
+              - int, number of samples in shared memory (num_samples)
+              - int, index of the first sample of the events (first)
+              - int, index of the last sample of the events (last)
+              - numpy.ndarray, event table (events)
+              - list, durations, minutes (durations)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - int, maximum number of moving windows per block (block_size)
+    Output:   numpy.ndarray, maximum rainfall for each event and duration
+    Features: Returns the duration maxima of a group of events from the
+              samples held in shared memory by calc_parallel_maxima
+    Depends:  calc_duration_maxima
+    """
+    import multiprocessing.shared_memory
+
+    my_shm = [multiprocessing.shared_memory.SharedMemory(name=my_name)
+              for my_name in shm_names]
+    try:
+        seconds = numpy.ndarray(
+            num_samples, dtype=numpy.int64, buffer=my_shm[0].buf)
+        cum_rain = numpy.ndarray(
+            num_samples, dtype=numpy.float64, buffer=my_shm[1].buf)
+        my_events = events.copy()
+        my_events['start'] -= first
+        my_events['end'] -= first
+        maxima = calc_duration_maxima(
+            seconds[first:last + 1], cum_rain[first:last + 1], my_events,
+            durations, is_rate, block_size)
+    finally:
+        # Release the views before closing the shared memory:
+        seconds = cum_rain = None
+        for my_block in my_shm:
+            my_block.close()
+
+    return maxima
+
+
+def calc_parallel_maxima(timestamps, cum_rain, events, durations,
+                         is_rate=False, workers=None, tasks_per_worker=4,
+                         block_size=2**20):
+    """
+    Name:     calc_parallel_maxima
+    Input:    - numpy.ndarray, timestamps (timestamps)
+              - numpy.ndarray, cumulative rainfall (cum_rain)
+              - numpy.ndarray, event table (events)
+              - list, durations, minutes (durations)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - [optional] int, number of worker processes (workers)
+              - int, number of tasks per worker process (tasks_per_worker)
+              - int, maximum number of moving windows per block (block_size)
+    Output:   numpy.ndarray, maximum rainfall for each event and duration
+    Features: Returns the same matrix as calc_duration_maxima, computed
+              across a pool of processes; the epoch seconds and cumulative
+              rainfall are placed in shared memory (rather than copied to
+              each process) and the events are split into groups of about
+              the same number of samples
+    Depends:  - calc_maxima_task
+              - init_worker
+              - to_seconds
+    """
+    # The process pool and shared memory modules are only imported when
+    # they are used, keeping them out of serial runs' start-up:
+    import concurrent.futures
+    import multiprocessing.shared_memory
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seconds = to_seconds(timestamps)
+    num_samples = len(seconds)
+
+    # Split the events into groups of about the same number of samples:
+    num_tasks = max(1, min(len(events), workers*tasks_per_worker))
+    edges = numpy.array([0, len(events)])
+    if len(events) > 0:
+        task_samples = numpy.cumsum(events['end'] - events['start'] + 1)
+        edges = numpy.searchsorted(
+            task_samples, task_samples[-1]*numpy.arange(1, num_tasks)/num_tasks,
+            side='right')
+        edges = numpy.unique(numpy.concatenate(([0], edges, [len(events)])))
+
+    maxima = numpy.zeros((len(events), len(durations)))
+    my_shm = []
+    try:
+        for my_array in (seconds, cum_rain):
+            my_block = multiprocessing.shared_memory.SharedMemory(
+                create=True, size=max(num_samples*8, 1))
+            my_shm.append(my_block)
+            numpy.ndarray(num_samples, dtype=my_array.dtype,
+                          buffer=my_block.buf)[:] = my_array
+        shm_names = tuple(my_block.name for my_block in my_shm)
+
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=init_worker,
+                initargs=(USE_JIT,)) as pool:
+            futures = {}
+            for i, j in zip(edges[:-1], edges[1:]):
+                if j <= i:
+                    continue
+                my_future = pool.submit(
+                    calc_maxima_task, shm_names, num_samples,
+                    events['start'][i], events['end'][j - 1], events[i:j],
+                    durations, is_rate, block_size)
+                futures[my_future] = (i, j)
+            for my_future in concurrent.futures.as_completed(futures):
+                i, j = futures[my_future]
+                maxima[i:j] = my_future.result()
+    finally:
+        for my_block in my_shm:
+            my_block.close()
+            my_block.unlink()
+
+    return maxima
+
+
+def calc_pds_idf(maxima, durations=DURATIONS, return_periods=RETURN_PERIODS,
+                 num_years=1.0, threshold=0.0):
+    """
+    Name:     calc_pds_idf
+    Input:    - numpy.ndarray, event maxima for each duration (maxima)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - float, record length, years (num_years)
+              - float, rainfall intensity threshold, in/hr (threshold)
+    Output:   numpy.ndarray, IDF matrix (durations x return periods)
+    Features: Returns the rainfall intensities (in/hr) for each duration and
+              return period from the partial duration series, i.e., the
+              event maxima above the threshold; with an average of L peaks
+              per year, the T-year value is the quantile at
+              F = 1 - 1/(L*T) of the peaks' empirical CDF; return periods
+              with L*T < 1 (fewer than one peak expected) are NaN
+    Depends:  calc_ecdf_quantiles
+    """
+    durations = numpy.asarray(durations, dtype=numpy.float64)
+    return_periods = numpy.asarray(return_periods, dtype=numpy.float64)
+    peaks = numpy.where(maxima > threshold*durations/60.0, maxima, numpy.nan)
+    peak_rates = numpy.count_nonzero(~numpy.isnan(peaks), axis=0)/num_years
+
+    idf = numpy.zeros((len(durations), len(return_periods)))
+    for n in range(len(durations)):
+        # Durations without peaks are NaN:
+        with numpy.errstate(divide='ignore'):
+            myfreqs = 1.0 - 1.0/(peak_rates[n]*return_periods)
+        idf[n] = calc_ecdf_quantiles(peaks[:, n:n + 1], myfreqs)[0]
+
+        # The quantile is undefined below F = 0 (rather than the smallest
+        # peak):
+        idf[n, myfreqs < 0] = numpy.nan
+    idf *= 60.0/durations[:, None]
+
+    return idf
+
+
+def calc_run_gaps(seconds, starts, stops):
+    """
+    Name:     calc_run_gaps
+    Input:    - numpy.ndarray, epoch seconds (seconds)
+              - numpy.ndarray, first wet index of each run (starts)
+              - numpy.ndarray, last wet index of each run (stops)
+    Output:   numpy.ndarray, dry gap before each run but the first, hours
+    Features: Returns the time between the ending dry sample of one wet run
+              and the first wet sample of the next, which is what the MIT
+              is compared against
+    """
+    trailing = numpy.minimum(stops + 1, len(seconds) - 1)
+    return (seconds[starts[1:]] - seconds[trailing[:-1]])/3600.0
+
+
+def calc_sparse_maxima(sparse, events, durations, is_rate=False):
+    """
+    Name:     calc_sparse_maxima
+    Input:    - SparseSeries, rainfall time series (sparse)
+              - numpy.ndarray, event table (events)
+              - list, durations, minutes (durations)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+    Output:   numpy.ndarray, maximum rainfall for each event and duration
+    Features: Returns the same matrix as calc_duration_maxima for a sparse
+              series; as moving a window's start past a dry sample never
+              decreases its total, only the windows starting at a wet sample
+              (or, for rates, at the dry sample before it) or at the last
+              starting sample are searched
+    """
+    durations = numpy.asarray(durations, dtype=numpy.float64)
+    totals = (sparse.cumulative_rain(events['end'], is_rate) -
+              sparse.cumulative_rain(events['start'], is_rate))
+    maxima = numpy.repeat(totals[:, None], len(durations), axis=1)
+    if len(events) == 0 or len(durations) == 0:
+        return maxima
+
+    long_events = numpy.flatnonzero(
+        (events['duration'] > durations.min()/60.0) &
+        (events['end'] - events['start'] > 1))
+    first = events['start'][long_events]
+    last = events['end'][long_events] - 2
+
+    # Candidate window starts of each event:
+    wet = sparse.indices[sparse.values > 0]
+    my_starts = [last]
+    my_events = [numpy.arange(len(long_events))]
+    for my_shift in ((0, 1) if is_rate else (0,)):
+        lo = numpy.searchsorted(wet, first + my_shift, side='left')
+        hi = numpy.searchsorted(wet, last + my_shift, side='right')
+        my_counts = hi - lo
+        my_offsets = numpy.cumsum(my_counts) - my_counts
+        my_wet = numpy.arange(my_counts.sum())
+        my_wet += numpy.repeat(lo - my_offsets, my_counts)
+        my_starts.append(wet[my_wet] - my_shift)
+        my_events.append(numpy.repeat(numpy.arange(len(long_events)),
+                                      my_counts))
+    win_start = numpy.concatenate(my_starts)
+    win_event = numpy.concatenate(my_events)
+    order = numpy.lexsort((win_start, win_event))
+    win_start = win_start[order]
+    win_event = win_event[order]
+    win_stop = events['end'][long_events][win_event]
+    offsets = numpy.flatnonzero(numpy.diff(win_event, prepend=-1))
+    cum_start = sparse.cumulative_rain(win_start, is_rate)
+
+    # Durations with the same window length (in samples) share their maxima:
+    # (windows shorter than a step hold no rainfall, see calc_window_maxima):
+    window_len = numpy.floor(durations*60.0).astype(numpy.int64)
+    window_len = numpy.where(
+        window_len < sparse.step, 0, window_len//sparse.step + 1)
+    prev_len = None
+    for n in numpy.argsort(durations, kind='stable'):
+        if window_len[n] != prev_len:
+            win_end = numpy.minimum(win_start + window_len[n], win_stop)
+            my_maxima = numpy.maximum.reduceat(
+                sparse.cumulative_rain(win_end, is_rate) - cum_start,
+                offsets)
+            prev_len = window_len[n]
+        is_long = events['duration'][long_events] > durations[n]/60.0
+        maxima[long_events[is_long], n] = my_maxima[is_long]
+
+    return maxima
+
+
+def calc_tile_idf(seconds, rain, durations=DURATIONS,
+                  return_periods=RETURN_PERIODS, mit=MIT, is_rate=False):
+    """
+    Name:     calc_tile_idf
+    Input:    - numpy.ndarray, epoch seconds (seconds)
+              - numpy.ndarray, rainfall, time x cells (rain)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - float, minimum inter-event time, hours (mit)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+    Output:   tuple, IDF matrices (cells x durations x return periods) and
+              the number of rain events of each cell
+    Features: Returns the same IDF matrix for each cell as compute_idf, with
+              a single pass over all cells: the cells are laid end to end,
+              each followed by a missing sample more than the MIT later,
+              such that no wet run or event crosses from one cell to the
+              next; cells without events are NaN
+    Depends:  - calc_duration_maxima
+              - calc_ecdf_quantiles
+              - calc_run_gaps
+              - find_wet_runs
+              - make_event_table
+    """
+    num_times, num_cells = rain.shape
+    durations = numpy.asarray(durations, dtype=numpy.float64)
+    my_len = num_times + 1
+
+    # Each cell's samples, its missing sample (gap seconds after its last
+    # sample) and the gap before the next cell:
+    gap = int(mit*3600) + 1
+    my_rain = numpy.empty((num_cells, my_len))
+    my_rain[:, :-1] = rain.T
+    my_rain[:, -1] = numpy.nan
+    my_seconds = numpy.empty((num_cells, my_len), dtype=numpy.int64)
+    my_seconds[:, :-1] = seconds
+    my_seconds[:, -1] = seconds[-1] + gap
+    my_seconds += (numpy.arange(num_cells, dtype=numpy.int64)[:, None] *
+                   (seconds[-1] - seconds[0] + 2*gap))
+
+    # The rainfall accumulates from the start of each cell (see
+    # cumulative_rain):
+    cum_rain = numpy.zeros((num_cells, my_len))
+    my_wet = numpy.where(my_rain > 0, my_rain, 0.0)
+    if is_rate:
+        numpy.cumsum(0.5*(my_wet[:, :-1] + my_wet[:, 1:]) *
+                     numpy.diff(my_seconds, axis=1)/3600.0,
+                     axis=1, out=cum_rain[:, 1:])
+    else:
+        numpy.cumsum(my_wet[:, :-1], axis=1, out=cum_rain[:, 1:])
+    my_rain = my_rain.ravel()
+    my_seconds = my_seconds.ravel()
+    cum_rain = cum_rain.ravel()
+
+    starts, stops = find_wet_runs(my_rain)
+    breaks = numpy.ones(len(starts), dtype=bool)
+    breaks[1:] = calc_run_gaps(my_seconds, starts, stops) > mit
+    events = make_event_table(my_seconds, my_rain, starts, stops, breaks,
+                              is_rate, cum_rain)
+
+    # Events ending at a cell's last sample end there, not at its missing
+    # sample:
+    cells = events['start']//my_len
+    events['end'] = numpy.minimum(events['end'], cells*my_len + num_times - 1)
+    events['total'] = cum_rain[events['end']] - cum_rain[events['start']]
+    maxima = calc_duration_maxima(my_seconds, cum_rain, events, durations,
+                                  is_rate)
+
+    # Each cell's maxima fill a column per duration (padded with NaN):
+    num_events = numpy.bincount(cells, minlength=num_cells)
+    ranks = numpy.arange(len(events)) - (numpy.cumsum(num_events) -
+                                         num_events)[cells]
+    samples = numpy.full(
+        (max(num_events.max(initial=0), 1), num_cells, len(durations)),
+        numpy.nan)
+    samples[ranks, cells] = maxima
+
+    myfreqs = 1.0 - 1.0/numpy.asarray(return_periods, dtype=numpy.float64)
+    idf = calc_ecdf_quantiles(
+        samples.reshape(len(samples), -1), myfreqs).reshape(
+            num_cells, len(durations), len(myfreqs))
+    idf *= 60.0/durations[:, None]
+
+    return (idf, num_events)
+
+
+def calc_window_maxima(seconds, cum_rain, events, durations, is_regular,
+                       step, is_rate=False, block_size=2**20):
+    """
+    Name:     calc_window_maxima
+    Input:    - numpy.ndarray, epoch seconds (seconds)
+              - numpy.ndarray, cumulative rainfall (cum_rain)
+              - numpy.ndarray, event table (events)
+              - numpy.ndarray, durations, minutes (durations)
+              - bool, the events are sampled every step (is_regular)
+              - int, time between regular samples, seconds (step)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - int, maximum number of moving windows per block (block_size)
+    Output:   numpy.ndarray, maximum rainfall for each event and duration
+    Features: Returns the (events x durations) matrix of the maximum rainfall
+              in the moving windows of each event for each duration the event
+              is longer than (other elements are its total rainfall); all
+              durations are found in a single pass over each block of events;
+              as in the original moving window, a window whose next sample
+              is more than the duration past its start holds no rainfall
+              (e.g., durations shorter than the time between samples); as
+              the original event lists keep only the dry samples next to a
+              wet one, no window of rates starts between two dry samples
+              (i.e., inside a dry gap of merged wet runs), where it would
+              take half the trapezoid of the next wet sample
+    """
+    maxima = numpy.repeat(
+        (cum_rain[events['end']] - cum_rain[events['start']])[:, None],
+        len(durations), axis=1)
+
+    # Durations in ascending order with their window lengths (seconds):
+    dur_order = numpy.argsort(durations, kind='stable')
+    window_sec = numpy.floor(durations*60.0).astype(numpy.int64)
+
+    # Sorting regular events longest first, the events searched for each
+    # duration are a prefix of those searched for a shorter one; irregular
+    # events keep their order, so the timestamps are searched in order:
+    if is_regular:
+        by_length = numpy.argsort(-events['duration'], kind='stable')
+    else:
+        by_length = numpy.arange(len(events))
+    num_windows = events['end'][by_length] - events['start'][by_length] - 1
+
+    # Process the events in blocks to bound the memory footprint:
+    block_ends = numpy.cumsum(num_windows)
+    i = 0
+    while i < len(by_length):
+        j = numpy.searchsorted(
+            block_ends, block_ends[i] - num_windows[i] + block_size,
+            side='right')
+        j = max(j, i + 1)
+        my_events = by_length[i:j]
+        my_counts = num_windows[i:j]
+        my_durations = events['duration'][my_events]
+
+        # Window starting indices and the ending index of their event:
+        offsets = numpy.cumsum(my_counts) - my_counts
+        win_start = numpy.arange(my_counts.sum())
+        win_start += numpy.repeat(
+            events['start'][my_events] - offsets, my_counts)
+        win_stop = numpy.repeat(events['end'][my_events], my_counts)
+        cum_start = cum_rain[win_start]
+        if not is_regular:
+            sec_start = seconds[win_start]
+        if is_rate:
+            # Nothing is integrated on either side of a dry sample between
+            # two dry ones (an event never starts at one):
+            in_gap = ((cum_rain[win_start + 1] == cum_start) &
+                      (cum_rain[win_start - 1] == cum_start))
+
+        # Durations with the same window length (in samples for regular
+        # events) and the same events searched share their maxima:
+        prev_key = None
+        for n in dur_order:
+            is_long = my_durations > durations[n]/60.0
+            num_events = numpy.count_nonzero(is_long)
+            if num_events == 0:
+                # Neither this nor any longer duration searches these events
+                break
+            if is_regular and window_sec[n] < step:
+                # No window holds a second sample (see calc_window_maxima):
+                my_key = (0, num_events)
+            elif is_regular:
+                my_key = (window_sec[n]//step + 1, num_events)
+            else:
+                my_key = (window_sec[n], num_events)
+            if my_key != prev_key:
+                # Windows of the events searched (for regular events, the
+                # first of the block):
+                if num_events == len(my_events):
+                    my_wins = slice(None)
+                    my_offsets = offsets
+                elif is_regular:
+                    my_wins = slice(
+                        0, offsets[num_events - 1] + my_counts[num_events - 1])
+                    my_offsets = offsets[:num_events]
+                else:
+                    my_wins = numpy.repeat(is_long, my_counts)
+                    my_offsets = numpy.cumsum(my_counts[is_long])
+                    my_offsets -= my_counts[is_long]
+
+                if is_regular:
+                    win_end = win_start[my_wins] + my_key[0]
+                else:
+                    win_end = numpy.searchsorted(
+                        seconds, sec_start[my_wins] + my_key[0], side='right')
+                    win_end[win_end == win_start[my_wins] + 1] -= 1
+                numpy.minimum(win_end, win_stop[my_wins], out=win_end)
+
+                # Define the duration storm as the maximum (window totals
+                # are never negative, so skipped windows are zero):
+                my_totals = cum_rain[win_end] - cum_start[my_wins]
+                if is_rate:
+                    my_totals[in_gap[my_wins]] = 0.0
+                my_maxima = numpy.maximum.reduceat(my_totals, my_offsets)
+                prev_key = my_key
+            maxima[my_events[is_long], n] = my_maxima
+        i = j
+
+    return maxima
+
+
+def compute_idf(timestamps, rain, durations=DURATIONS,
+                return_periods=RETURN_PERIODS, mit=MIT, is_rate=False,
+                profiler=None, workers=1):
+    """
+    Name:     compute_idf
+    Input:    - numpy.ndarray, timestamps (timestamps)
+              - numpy.ndarray, rainfall amounts (rain)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - float, minimum inter-event time, hours (mit)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - [optional] StageProfiler, records each stage (profiler)
+              - [optional] int, number of worker processes for the duration
+                maxima (workers); None for the number of CPUs
+    Output:   numpy.ndarray, IDF matrix (durations x return periods)
+    Features: Returns the rainfall intensities (in/hr) of a rainfall time
+              series for each duration and return period
+    Depends:  - calc_duration_maxima
+              - calc_idf
+              - calc_parallel_maxima
+              - cumulative_rain
+              - find_events
+              - to_seconds
+    """
+    if profiler is None:
+        profiler = StageProfiler(enabled=False)
+
+    with profiler.stage('find_events', rows=len(rain)) as my_stage:
+        seconds = to_seconds(timestamps)
+        events = find_events(seconds, rain, mit, is_rate)
+        my_stage['events'] = len(events)
+    if len(events) == 0:
+        raise ValueError("Error! No rain events found!")
+    with profiler.stage('calc_duration_maxima', rows=len(rain),
+                        events=len(events)):
+        cum_rain = cumulative_rain(rain, seconds, is_rate)
+        if workers == 1:
+            maxima = calc_duration_maxima(
+                seconds, cum_rain, events, durations, is_rate)
+        else:
+            maxima = calc_parallel_maxima(
+                seconds, cum_rain, events, durations, is_rate, workers)
+    with profiler.stage('calc_idf', events=len(events)):
+        idf = calc_idf(maxima, durations, return_periods)
+
+    return idf
+
+
+def compute_idf_sweep(timestamps, rain, mits, durations=DURATIONS,
+                      return_periods=RETURN_PERIODS, is_rate=False):
+    """
+    Name:     compute_idf_sweep
+    Input:    - numpy.ndarray, timestamps (timestamps)
+              - numpy.ndarray, rainfall amounts (rain)
+              - list, minimum inter-event times, hours (mits)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+    Output:   dict, IDF matrices (durations x return periods) by MIT
+    Features: Returns the IDF matrix of a rainfall time series for each of
+              many MITs; the wet runs and the dry gaps between them are found
+              once and, as a larger MIT only merges the events of a smaller
+              one, the maxima of events left unchanged by the next larger MIT
+              are reused
+    Depends:  - calc_duration_maxima
+              - calc_idf
+              - calc_run_gaps
+              - cumulative_rain
+              - find_wet_runs
+              - make_event_table
+              - to_seconds
+    """
+    seconds = to_seconds(timestamps)
+    rain = numpy.asarray(rain)
+    starts, stops = find_wet_runs(rain)
+    gaps = calc_run_gaps(seconds, starts, stops)
+    cum_rain = cumulative_rain(rain, seconds, is_rate)
+
+    results = {}
+    prev_events = numpy.zeros(0, dtype=EVENT_DTYPE)
+    prev_maxima = numpy.zeros((0, len(durations)))
+    for mit in sorted(set(mits)):
+        breaks = numpy.ones(len(starts), dtype=bool)
+        breaks[1:] = gaps > mit
+        events = make_event_table(
+            seconds, rain, starts, stops, breaks, is_rate, cum_rain)
+        if len(events) == 0:
+            raise ValueError("Error! No rain events found!")
+
+        # Events with the same span as for the previous MIT are unchanged:
+        maxima = numpy.zeros((len(events), len(durations)))
+        is_same = numpy.zeros(len(events), dtype=bool)
+        if len(prev_events) > 0:
+            k = numpy.searchsorted(prev_events['start'], events['start'])
+            k = numpy.minimum(k, len(prev_events) - 1)
+            is_same = ((prev_events['start'][k] == events['start']) &
+                       (prev_events['end'][k] == events['end']))
+            maxima[is_same] = prev_maxima[k[is_same]]
+        is_new = numpy.flatnonzero(~is_same)
+        maxima[is_new] = calc_duration_maxima(
+            seconds, cum_rain, events[is_new], durations, is_rate)
+
+        results[mit] = calc_idf(maxima, durations, return_periods)
+        prev_events = events
+        prev_maxima = maxima
+
+    return results
+
+
+def cumulative_rain(rain, seconds=None, is_rate=False):
+    """
+    Name:     cumulative_rain
+    Input:    - numpy.ndarray, rainfall amounts or rates (rain)
+              - [optional] numpy.ndarray, epoch seconds (seconds)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+    Output:   numpy.ndarray, cumulative rainfall
+    Features: Returns the rainfall accumulated before each sample, such that
+              the total rainfall between samples m and n is the difference of
+              the nth and mth values; only positive rainfall is accumulated
+              * amounts: the total of samples m to n-1
+              * rates: the trapezoidal integral from sample m to n (requires
+                the epoch seconds)
+    """
+    rain = numpy.asarray(rain)
+    cum_rain = numpy.zeros(len(rain))
+    rain = numpy.where(rain > 0, rain, 0.0)
+    if is_rate:
+        if seconds is None:
+            raise ValueError("Rainfall rates require timestamps!")
+        delta_t = numpy.diff(seconds)/3600.0
+        numpy.cumsum(0.5*(rain[:-1] + rain[1:])*delta_t, out=cum_rain[1:])
+    else:
+        numpy.cumsum(rain[:-1], out=cum_rain[1:])
+    return cum_rain
+
+
+def evict_cache(cache_dir, max_size=CACHE_SIZE):
+    """
+    Name:     evict_cache
+    Input:    - str, cache directory (cache_dir)
+              - int, maximum size of the cache directory, bytes (max_size)
+    Output:   None
+    Features: Removes the least recently used cache files until the cache
+              directory is no larger than the maximum size
+    """
+    cache_files = []
+    for cache_file in glob.glob(os.path.join(cache_dir, "*.npy")):
+        try:
+            my_stat = os.stat(cache_file)
+        except OSError:
+            continue
+        cache_files.append((my_stat.st_mtime, my_stat.st_size, cache_file))
+
+    cache_files.sort()
+    total_size = sum(my_size for my_time, my_size, my_file in cache_files)
+    for my_time, my_size, my_file in cache_files:
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(my_file)
+        except OSError:
+            continue
+        total_size -= my_size
+
+
+def find_events(timestamps, rain, mit=MIT, is_rate=False):
+    """
+    Name:     find_events
+    Input:    - numpy.ndarray, timestamps (timestamps)
+              - numpy.ndarray, rainfall amounts (rain)
+              - float, minimum inter-event time, hours (mit)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+    Output:   numpy.ndarray, event table (events)
+    Features: Returns the rain events of a time series as a structured array
+              with one row per event (see EVENT_DTYPE); wet runs separated
+              by no more than the MIT are merged into a single event
+    Depends:  - calc_run_gaps
+              - find_wet_runs
+              - make_event_table
+              - to_seconds
+    """
+    seconds = to_seconds(timestamps)
+    rain = numpy.asarray(rain)
+    starts, stops = find_wet_runs(rain)
+
+    # The first wet run always begins a new event; the following runs begin
+    # new events only if the MIT requirement is met:
+    breaks = numpy.ones(len(starts), dtype=bool)
+    breaks[1:] = calc_run_gaps(seconds, starts, stops) > mit
+
+    return make_event_table(seconds, rain, starts, stops, breaks, is_rate)
+
+
+def find_sparse_events(sparse, mit=MIT, is_rate=False):
+    """
+    Name:     find_sparse_events
+    Input:    - SparseSeries, rainfall time series (sparse)
+              - float, minimum inter-event time, hours (mit)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+    Output:   numpy.ndarray, event table (events)
+    Features: Returns the same event table as find_events for a sparse
+              series, scanning only its nonzero samples
+    """
+    indices = sparse.indices
+    wet = indices[sparse.values > 0]
+
+    # Runs of consecutive wet samples:
+    is_first = numpy.ones(len(wet), dtype=bool)
+    is_first[1:] = numpy.diff(wet) != 1
+    starts = wet[is_first]
+    stops = wet[numpy.append(is_first[1:], True)]
+
+    # A storm starts at a positive rainfall following a zero (i.e., unstored)
+    # rainfall; runs at the beginning of the record or following a missing or
+    # negative value are not counted:
+    my_pos = numpy.searchsorted(indices, starts)
+    is_start = starts > 0
+    is_start[my_pos > 0] &= (
+        indices[my_pos[my_pos > 0] - 1] != starts[my_pos > 0] - 1)
+    starts = starts[is_start]
+    stops = stops[is_start]
+
+    # The first wet run always begins a new event; the following runs begin
+    # new events only if the MIT requirement is met:
+    trailing = numpy.minimum(stops + 1, sparse.num_samples - 1)
+    breaks = numpy.ones(len(starts), dtype=bool)
+    breaks[1:] = (starts[1:] - trailing[:-1])*sparse.step/3600.0 > mit
+
+    first_run = numpy.flatnonzero(breaks)
+    if len(first_run) == 0:
+        return numpy.zeros(0, dtype=EVENT_DTYPE)
+    last_run = numpy.append(first_run[1:], len(starts)) - 1
+    first_wet = starts[first_run]
+    last_wet = stops[last_run]
+
+    events = numpy.zeros(len(first_run), dtype=EVENT_DTYPE)
+    events['start'] = first_wet - 1
+    events['end'] = numpy.minimum(last_wet + 1, sparse.num_samples - 1)
+    events['duration'] = (last_wet - first_wet)*sparse.step/3600.0
+    events['duration'][first_wet == last_wet] = PrecipEvent.MINIMUM_DURATION
+    events['total'] = (sparse.cumulative_rain(events['end'], is_rate) -
+                       sparse.cumulative_rain(events['start'], is_rate))
+
+    return events
+
+
+def find_wet_runs(rain):
+    """
+    Name:     find_wet_runs
+    Input:    numpy.ndarray, rainfall amounts (rain)
+    Output:   tuple, first and last wet sample indices of each run
+    Features: Returns the index bounds of every run of positive rainfall that
+              begins immediately after a zero rainfall sample
+    """
+    rain = numpy.asarray(rain)
+    wet = numpy.zeros(len(rain) + 2, dtype=numpy.int8)
+    wet[1:-1] = rain > 0
+    edges = numpy.diff(wet)
+    starts = numpy.flatnonzero(edges == 1)
+    stops = numpy.flatnonzero(edges == -1) - 1
+
+    # A storm starts at a positive rainfall following a zero rainfall; runs
+    # at the beginning of the record or following a missing (i.e., NaN) or
+    # negative value are not counted:
+    is_start = numpy.zeros(len(starts), dtype=bool)
+    is_start[starts > 0] = rain[starts[starts > 0] - 1] == 0
+
+    return (starts[is_start], stops[is_start])
+
+
+def get_cache_file(rain_file, cache_dir, tag="raw"):
+    """
+    Name:     get_cache_file
+    Input:    - str, rainfall file (rain_file)
+              - str, cache directory (cache_dir)
+              - str, description of the cached series (tag)
+    Output:   str, cache file name
+    Features: Returns the cache file for the current state of a rainfall
+              file; the name is keyed by the file's path, size, modification
+              time and content hash, so a changed file never matches a stale
+              cache file
+    """
+    rain_file = os.path.abspath(rain_file)
+    my_stat = os.stat(rain_file)
+    path_key = hashlib.blake2b(
+        rain_file.encode('utf-8'), digest_size=8).hexdigest()
+
+    my_hash = hashlib.blake2b(digest_size=16)
+    my_hash.update(("%d %d" % (my_stat.st_size, my_stat.st_mtime_ns)).encode())
+    with open(rain_file, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            my_hash.update(block)
+
+    return os.path.join(
+        cache_dir, "%s-%s-%s.npy" % (path_key, tag, my_hash.hexdigest()))
+
+
+def get_jit_kernels():
+    """
+    Name:     get_jit_kernels
+    Input:    None.
+    Output:   dict, compiled kernels (None if not used)
+    Features: Compiles the sequential kernels with the optional Numba package
+              on first use; compiled code is cached next to this module, so
+              later runs skip the compilation; returns None, such that the
+              NumPy functions are used, if Numba is not installed or USE_JIT
+              is off
+    """
+    if not USE_JIT:
+        return None
+    if not JIT_KERNELS:
+        try:
+            import numba
+        except ImportError:
+            return None
+        JIT_KERNELS['scan_window_maxima'] = numba.njit(
+            cache=True, nogil=True)(scan_window_maxima)
+    return JIT_KERNELS
+
+
+def get_netcdf4():
+    """
+    Name:     get_netcdf4
+    Input:    None.
+    Output:   module, netCDF4
+    Features: Imports the optional netCDF4 package on first use (for gridded
+              netCDF input)
+    """
+    try:
+        import netCDF4
+    except ImportError:
+        raise ImportError("NetCDF input requires the netCDF4 package.")
+    return netCDF4
+
+
+def get_pyarrow():
+    """
+    Name:     get_pyarrow
+    Input:    None.
+    Output:   tuple, pyarrow and pyarrow.parquet modules
+    Features: Imports the optional pyarrow package on first use (for Parquet
+              output)
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet output requires the pyarrow package.")
+    return (pyarrow, pyarrow.parquet)
+
+
+def get_pyplot(headless=False):
+    """
+    Name:     get_pyplot
+    Input:    bool, use a non-interactive backend (headless)
+    Output:   module, matplotlib.pyplot
+    Features: Imports matplotlib's pyplot on first use, so that importing
+              this module does not pay for (or fail on) a backend probe;
+              the Agg backend is used when headless, e.g., for saving
+              figures on a server without a display
+    """
+    import matplotlib
+    if headless:
+        matplotlib.use('Agg', force=True)
+    from matplotlib import pyplot as plt
+    return plt
+
+
+def get_timestamp_format(line):
+    """
+    Name:     get_timestamp_format
+    Input:    str, a line of rainfall data (line)
+    Output:   tuple, field order and number of timestamp fields
+    Features: Returns the order of the year, month and day fields and the
+              number of numeric fields of a line's timestamp, which is either
+              of the form YYYY-MM-DD HH:MM[:SS] or MM/DD/YYYY HH:MM[:SS]
+    """
+    timestamp = line.split(',')[0].strip()
+    if re.match(r'^\d{4}-\d{1,2}-\d{1,2}[ T]\d{1,2}:\d{2}(:\d{2})?$', timestamp):
+        order = ('year', 'month', 'day')
+    elif re.match(r'^\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}(:\d{2})?$', timestamp):
+        order = ('month', 'day', 'year')
+    else:
+        raise ValueError("Error! Could not process time stamp!")
+
+    return (order, 4 + timestamp.count(':'))
+
+
+def init_worker(use_jit):
+    """
+    Name:     init_worker
+    Input:    bool, use the Numba-compiled kernels (use_jit)
+    Output:   None
+    Features: Sets USE_JIT in a worker process to the value of the parent
+              process; a worker started with spawn re-imports this module,
+              which would otherwise reset the option (e.g., --no_jit)
+    """
+    global USE_JIT
+    USE_JIT = use_jit
+
+
+def iter_rainfall(rain_file, usgs=False, csv_file=None,
+                  chunk_size=CHUNK_SIZE):
+    """
+    Name:     iter_rainfall
+    Input:    - str, rainfall file (rain_file)
+              - bool, file is a USGS raingage file (usgs)
+              - [optional] str, CSV file for formatted USGS data (csv_file)
+              - int, number of lines per chunk (chunk_size)
+    Output:   generator, numpy.ndarray rainfall time series chunks
+    Features: Streams a rainfall file as rainfall time series chunks of a
+              fixed number of lines, such that only one chunk is held in
+              memory at a time
+    Depends:  - iter_rainfall_chunks
+              - iter_usgs_lines
+    """
+    if not os.path.isfile(rain_file):
+        raise IOError("Could not find input file. Check filename and path.")
+
+    if usgs:
+        for my_chunk in iter_rainfall_chunks(
+                iter_usgs_lines(rain_file, csv_file), chunk_size):
+            yield my_chunk
+    else:
+        with open(rain_file, 'r') as f:
+            f.readline()
+            for my_chunk in iter_rainfall_chunks(f, chunk_size):
+                yield my_chunk
+
+
+def iter_rainfall_chunks(lines, chunk_size=CHUNK_SIZE):
+    """
+    Name:     iter_rainfall_chunks
+    Input:    - iterable, two-column text lines without header (lines)
+              - int, number of lines per chunk (chunk_size)
+    Output:   generator, numpy.ndarray rainfall time series chunks
+    Features: Parses lines of timestamps and rainfall amounts in chunks of
+              a fixed number of lines; the timestamp format is detected from
+              the first line
+    Depends:  parse_rainfall_lines
+    """
+    lines = iter(lines)
+    ts_format = None
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            break
+        if ts_format is None:
+            ts_format = get_timestamp_format(chunk[0])
+        yield parse_rainfall_lines(chunk, ts_format)
+
+
+def iter_usgs_lines(input_file, output_file=None):
+    """
+    Name:     iter_usgs_lines
+    Input:    - str, USGS rainfall file (input_file)
+              - [optional] str, CSV file to save output (output_file)
+    Output:   generator, str, lines of comma-separated datetime and rainfall
+    Features: Streams the data lines of a tab-separated USGS rainfall file as
+              two-column CSV lines, optionally writing them (with a header) to
+              a CSV file through a single buffered file handle
+    """
+    if output_file is not None and os.path.isfile(output_file):
+        print("Warning: Overwriting file %s" % (output_file))
+
+    with open(input_file, 'r') as f:
+        out_f = None
+        if output_file is not None:
+            try:
+                out_f = open(output_file, 'w')
+                out_f.write("datetime,rainfall\n")
+            except IOError:
+                raise IOError("Can not write to output file.")
+        try:
+            for line in f:
+                if line.startswith("U"):
+                    my_items = line.split("\t")
+                    # usgs file should have six columns beginning with 'USGS'
+                    # save only the datetime and rainfall amounts (cols 2&4)
+                    my_data = ','.join((my_items[2], my_items[4])) + '\n'
+                    if out_f is not None:
+                        out_f.write(my_data)
+                    yield my_data
+        finally:
+            if out_f is not None:
+                out_f.close()
+
+
+def iter_window_sums(seconds, cum_rain, durations=DURATIONS, starts=None):
+    """
+    Name:     iter_window_sums
+    Input:    - numpy.ndarray, epoch seconds (seconds)
+              - numpy.ndarray, cumulative rainfall (cum_rain)
+              - list, durations, minutes (durations)
+              - [optional] numpy.ndarray, window starting samples (starts)
+    Output:   generator, index of each duration and its window sums
+    Features: Yields the rainfall in the moving window of each duration
+              starting at each given sample (by default, every sample); as
+              for the event maxima, a window ends at the first sample more
+              than the duration past its start (or at the last sample),
+              which is excluded, and a window whose next sample is more than
+              the duration past its start holds no rainfall; durations with
+              the same window share their sums
+    """
+    if starts is None:
+        starts = numpy.arange(len(seconds))
+    deltas = numpy.diff(seconds)
+    is_regular = len(deltas) > 0 and (deltas == deltas[0]).all()
+    window_sec = numpy.floor(
+        numpy.asarray(durations, dtype=numpy.float64)*60.0).astype(numpy.int64)
+
+    prev_len = None
+    for n in range(len(durations)):
+        if window_sec[n] != prev_len:
+            if is_regular and window_sec[n] < deltas[0]:
+                win_end = starts.copy()
+            elif is_regular:
+                # Count samples rather than search the timestamps:
+                win_end = starts + (window_sec[n]//deltas[0] + 1)
+            else:
+                win_end = numpy.searchsorted(
+                    seconds, seconds[starts] + window_sec[n], side='right')
+                win_end[win_end == starts + 1] -= 1
+            numpy.minimum(win_end, len(seconds) - 1, out=win_end)
+            my_sums = cum_rain[win_end] - cum_rain[starts]
+            prev_len = window_sec[n]
+        yield (n, my_sums)
+
+
+def load_rainfall(rain_file, usgs=False, make_regular=False, csv_file=None,
+                  cache_dir=None, cache_size=CACHE_SIZE):
+    """
+    Name:     load_rainfall
+    Input:    - str, rainfall file (rain_file)
+              - bool, file is a USGS raingage file (usgs)
+              - bool, make a regular time series (make_regular)
+              - [optional] str, CSV file for formatted USGS data (csv_file)
+              - [optional] str, cache directory (cache_dir)
+              - int, maximum size of the cache directory, bytes (cache_size)
+    Output:   numpy.ndarray, rainfall time series
+    Features: Reads a rainfall file (or its cached copy) into a rainfall
+              time series, optionally regularizing it
+    Depends:  - get_cache_file
+              - load_cache
+              - make_regular_ts
+              - read_rainfall
+              - read_usgs
+              - save_cache
+    """
+    if not os.path.isfile(rain_file):
+        raise IOError("Could not find input file. Check filename and path.")
+
+    # Look for a cached copy of the rainfall series:
+    cache_file = None
+    if cache_dir is not None:
+        cache_tag = "usgs" if usgs else "csv"
+        if make_regular:
+            cache_tag += "_regular"
+        cache_file = get_cache_file(rain_file, cache_dir, cache_tag)
+        my_data = load_cache(cache_file)
+        if my_data is not None:
+            return my_data
+
+    try:
+        if usgs:
+            my_data = read_usgs(rain_file, csv_file)
+        else:
+            my_data = read_rainfall(rain_file)
+    except ValueError:
+        raise IOError("Could not read the input file. Check your format.")
+
+    # Make data into a regular time series (if necessary):
+    if make_regular:
+        my_data = make_regular_ts(my_data)
+
+    if cache_file is not None:
+        save_cache(my_data, cache_file, cache_size)
+
+    return my_data
+
+
+def load_cache(cache_file):
+    """
+    Name:     load_cache
+    Input:    str, cache file name (cache_file)
+    Output:   numpy.ndarray, rainfall time series (or None if not cached)
+    Features: Returns the memory-mapped rainfall time series saved in a cache
+              file and marks the file as recently used
+    """
+    if not os.path.isfile(cache_file):
+        return None
+    try:
+        my_data = numpy.load(cache_file, mmap_mode='r')
+        os.utime(cache_file)
+    except (OSError, ValueError):
+        print("Warning: Could not read cache file %s" % (cache_file))
+        return None
+    else:
+        return my_data
+
+
+def load_grid(grid_file, variable="precip", start=None, step=None):
+    """
+    Name:     load_grid
+    Input:    - str, gridded rainfall file, .npy or netCDF (grid_file)
+              - str, rainfall variable of a netCDF file (variable)
+              - [optional] str, time of the first sample of a .npy file,
+                e.g., 2010-01-01T00:00 (start)
+              - [optional] float, time between samples of a .npy file,
+                minutes (step)
+    Output:   tuple, timestamps and rainfall cube (time x rows [x columns])
+    Features: Opens a gridded rainfall file without reading it; .npy files
+              are memory-mapped and netCDF variables are read as they are
+              sliced (the timestamps come from the time coordinate, i.e.,
+              the variable's first dimension)
+    Depends:  get_netcdf4
+    """
+    if grid_file.lower().endswith(".npy"):
+        if start is None or step is None:
+            raise ValueError(
+                "Error! NPY grids require a start time and time step!")
+        cube = numpy.load(grid_file, mmap_mode='r')
+        timestamps = numpy.datetime64(start, 's') + (
+            int(round(step*60))*numpy.arange(len(cube)))
+    else:
+        netCDF4 = get_netcdf4()
+        my_data = netCDF4.Dataset(grid_file)
+        if variable not in my_data.variables:
+            raise ValueError("Error! Could not find variable %s in %s" % (
+                variable, grid_file))
+        cube = my_data.variables[variable]
+        my_time = my_data.variables[cube.dimensions[0]]
+        timestamps = numpy.array(
+            netCDF4.num2date(
+                my_time[:], my_time.units,
+                getattr(my_time, 'calendar', 'standard'),
+                only_use_cftime_datetimes=False,
+                only_use_python_datetimes=True),
+            dtype='datetime64[s]')
+    return (timestamps, cube)
+
+
+def make_event_table(seconds, rain, starts, stops, breaks, is_rate=False,
+                     cum_rain=None):
+    """
+    Name:     make_event_table
+    Input:    - numpy.ndarray, epoch seconds (seconds)
+              - numpy.ndarray, rainfall amounts (rain)
+              - numpy.ndarray, first wet index of each run (starts)
+              - numpy.ndarray, last wet index of each run (stops)
+              - numpy.ndarray, True where a run begins a new event (breaks)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - [optional] numpy.ndarray, cumulative rainfall (cum_rain)
+    Output:   numpy.ndarray, event table (events)
+    Features: Groups wet runs into rain events; each event spans from the dry
+              sample before its first wet run to the dry sample after its
+              last wet run, including any dry samples in between
+    Depends:  cumulative_rain
+    """
+    first_run = numpy.flatnonzero(breaks)
+    if len(first_run) == 0:
+        return numpy.zeros(0, dtype=EVENT_DTYPE)
+    last_run = numpy.append(first_run[1:], len(starts)) - 1
+    first_wet = starts[first_run]
+    last_wet = stops[last_run]
+
+    events = numpy.zeros(len(first_run), dtype=EVENT_DTYPE)
+    events['start'] = first_wet - 1
+    events['end'] = numpy.minimum(last_wet + 1, len(rain) - 1)
+
+    # Rainfall begins immediately before the first indication and ends
+    # immediately after the last (see PrecipEvent.calc_duration):
+    events['duration'] = (seconds[last_wet] - seconds[first_wet])/3600.0
+    events['duration'][first_wet == last_wet] = PrecipEvent.MINIMUM_DURATION
+
+    # Event totals exclude the ending dry sample (amounts) or integrate up
+    # to it (rates):
+    if cum_rain is None:
+        cum_rain = cumulative_rain(rain, seconds, is_rate)
+    events['total'] = cum_rain[events['end']] - cum_rain[events['start']]
+
+    return events
+
+
+def make_event_columns(events, maxima, durations, event_times=None):
+    """
+    Name:     make_event_columns
+    Input:    - numpy.ndarray, event table (events)
+              - numpy.ndarray, event maxima for each duration (maxima)
+              - list, durations, minutes (durations)
+              - [optional] numpy.ndarray, event start and end times
+                (event_times)
+    Output:   dict, columns of the event table by name
+    Features: Returns the event table and its duration maxima as named
+              columns (one per duration)
+    """
+    columns = {}
+    if event_times is not None:
+        columns['start_time'] = event_times[:, 0]
+        columns['end_time'] = event_times[:, 1]
+    columns['start'] = events['start']
+    columns['end'] = events['end']
+    columns['duration_hr'] = events['duration']
+    columns['total_in'] = events['total']
+    for d in range(len(durations)):
+        columns['max_%gmin_in' % (durations[d])] = maxima[:, d]
+    return columns
+
+
 def make_plot(mat, dur, lab, to_save=False):
     """
     Name:     make_plot
@@ -61,7 +1611,9 @@ def make_plot(mat, dur, lab, to_save=False):
               - bool, save figure to file (to_save)
     Output:   None
     Features: Creates a plot of IDF
+    Depends:  get_pyplot
     """
+    plt = get_pyplot(headless=to_save)
     fig = plt.figure(figsize=(8, 8), dpi=180)
 
     ax1 = fig.add_subplot(111)
@@ -76,7 +1628,8 @@ def make_plot(mat, dur, lab, to_save=False):
 
     ax1.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3,
                ncol=6, mode="expand", borderaxespad=0., fontsize=12)
-    plt.xlim([5e0, 1.5e3])
+    # Fit the durations, with a small margin on the log axis:
+    plt.xlim([numpy.min(dur)/1.05, 1.05*numpy.max(dur)])
 
     if to_save:
         my_date = datetime.datetime.today()
@@ -91,75 +1644,588 @@ def make_plot(mat, dur, lab, to_save=False):
         plt.show()
 
 
+def make_precip_events(timestamps, rain, events, is_rate=False):
+    """
+    Name:     make_precip_events
+    Input:    - numpy.ndarray, timestamps (timestamps)
+              - numpy.ndarray, rainfall amounts (rain)
+              - numpy.ndarray, event table (events)
+              - bool, rainfall data is a rate (is_rate)
+    Output:   list, PrecipEvent objects
+    Features: Returns a PrecipEvent for each row of an event table; the
+              events share (rather than copy) the rainfall time series and
+              its cumulative rainfall
+    Depends:  - cumulative_rain
+              - to_seconds
+    """
+    cum_rain = cumulative_rain(rain, to_seconds(timestamps), is_rate)
+    my_events = []
+    for i in range(len(events)):
+        my_event = PrecipEvent(
+            timestamps, rain, events['start'][i], events['end'][i], is_rate,
+            cum_rain)
+        my_event.duration = events['duration'][i]
+        my_event.total_rain = events['total'][i]
+        my_event.points = events['end'][i] - events['start'][i] + 1
+        my_events.append(my_event)
+
+    return my_events
+
+
 def make_regular_ts(x):
     """
     Name:     make_regular_ts
     Input:    numpy.ndarray, original data (x)
     Output:   numpy.ndarray, processed data
     Features: Creates a regular time series based on the mode of the timedeltas
+    Depends:  to_seconds
     """
-    ts_orig = x['timestamps']
-    data_orig = x['rain']
-    ts_deltas = []
-    for i in range(1, len(ts_orig)):
-        deltat = (ts_orig[i] - ts_orig[i-1]).total_seconds()/3600.0
-        ts_deltas.append(deltat)
-
-    ts_deltas = numpy.array(ts_deltas)
-
-    # Use mode as the regular interval
-    ts_mode = scipy.stats.mode(ts_deltas, axis=None)[0][0]
-
-    # Iterate through time, gap fill with zeros, average over smaller intervals
-    ts_start = ts_orig[0]
-    ts_end = ts_orig[-1]
-    ts_curr = ts_start
-    ts_time = [ts_start, ]
-    ts_data = [data_orig[0], ]
-    while ts_curr < ts_end:
-        ts_temp = ts_curr + datetime.timedelta(hours=ts_mode)
-        ts_time.append(ts_temp)
-        if ts_temp in ts_orig:
-            # The next timestamp already exists, set it as current!
-            ts_index = numpy.where(ts_orig == ts_temp)[0][0]
-            ts_data.append(data_orig[ts_index])
-            ts_curr = ts_temp
-        else:
-            # Did we over or undershoot?
-            ts_look = numpy.where((ts_orig > ts_curr) & (ts_orig <= ts_temp))
-            if len(ts_look[0]) > 0:
-                # We overshot, time to average!
-                ts_ave = data_orig[ts_look].mean()
-                ts_data.append(ts_ave)
-                ts_curr = ts_temp
-            else:
-                # We undershot, time to gapfill!
-                ts_data.append(0.0)
-                ts_curr = ts_temp
-
-    # Regroup data into numpy array:
-    my_data = numpy.array([])
-    for i in range(len(ts_data)):
-        var_params = (ts_time[i], ts_data[i])
-        if i == 0:
-            my_data = numpy.array(
-                var_params,
-                dtype={'names': ('timestamps', 'rain'),
-                       'formats': ('O', 'f4')},
-                ndmin=1
-            )
-        else:
-            my_temp = numpy.array(
-                var_params,
-                dtype={'names': ('timestamps', 'rain'),
-                       'formats': ('O', 'f4')},
-                ndmin=1
-            )
-            my_data = numpy.append(my_data, my_temp, axis=0)
+    ts_orig = to_seconds(x['timestamps'])
+    order = numpy.argsort(ts_orig, kind='stable')
+    ts_orig = ts_orig[order]
+    data_orig = numpy.asarray(x['rain'], dtype=numpy.float64)[order]
+
+    # Use mode as the regular interval (seconds); ties go to the shortest:
+    ts_deltas, ts_counts = numpy.unique(numpy.diff(ts_orig), return_counts=True)
+    if len(ts_deltas) == 0 or ts_deltas[ts_counts.argmax()] <= 0:
+        raise ValueError("Error! Could not find a regular time interval!")
+    ts_mode = ts_deltas[ts_counts.argmax()]
+
+    # Assign each sample to the first regular time stamp at or after it,
+    # i.e., regular time stamp k collects the samples in (k-1, k]:
+    ts_offsets = ts_orig - ts_orig[0]
+    ts_bins = -(-ts_offsets//ts_mode)
+    num_bins = ts_bins[-1] + 1
+
+    # Average over smaller intervals, gap fill with zeros:
+    ts_sums = numpy.bincount(ts_bins, weights=data_orig, minlength=num_bins)
+    ts_counts = numpy.bincount(ts_bins, minlength=num_bins)
+    ts_data = numpy.zeros(num_bins)
+    numpy.divide(ts_sums, ts_counts, out=ts_data, where=(ts_counts > 0))
+
+    # Where the regular time stamp already exists, keep its (first) value:
+    is_exact = numpy.flatnonzero(ts_offsets % ts_mode == 0)
+    exact_bins, first = numpy.unique(ts_bins[is_exact], return_index=True)
+    ts_data[exact_bins] = data_orig[is_exact[first]]
+    ts_data[0] = data_orig[0]
+
+    my_data = numpy.zeros(num_bins, dtype=x.dtype)
+    my_data['timestamps'] = (
+        ts_orig[0] + ts_mode*numpy.arange(num_bins)).astype('datetime64[s]')
+    my_data['rain'] = ts_data
 
     return my_data
 
 
+def make_sparse_regular_ts(x):
+    """
+    Name:     make_sparse_regular_ts
+    Input:    numpy.ndarray, original data (x)
+    Output:   SparseSeries, processed data
+    Features: Creates the same regular time series as make_regular_ts, but
+              stores only its nonzero samples, such that gap filling does
+              not create any rows
+    Depends:  to_seconds
+    """
+    ts_orig = to_seconds(x['timestamps'])
+    order = numpy.argsort(ts_orig, kind='stable')
+    ts_orig = ts_orig[order]
+    data_orig = numpy.asarray(x['rain'], dtype=numpy.float64)[order]
+
+    # Use mode as the regular interval (seconds); ties go to the shortest:
+    ts_deltas, ts_counts = numpy.unique(numpy.diff(ts_orig), return_counts=True)
+    if len(ts_deltas) == 0 or ts_deltas[ts_counts.argmax()] <= 0:
+        raise ValueError("Error! Could not find a regular time interval!")
+    ts_mode = ts_deltas[ts_counts.argmax()]
+
+    # Assign each sample to the first regular time stamp at or after it,
+    # i.e., regular time stamp k collects the samples in (k-1, k]:
+    ts_offsets = ts_orig - ts_orig[0]
+    ts_bins = -(-ts_offsets//ts_mode)
+
+    # Average over smaller intervals (only the regular time stamps with
+    # samples are kept; the others are zero):
+    my_bins, my_first = numpy.unique(ts_bins, return_index=True)
+    ts_data = numpy.add.reduceat(data_orig, my_first)
+    ts_data /= numpy.diff(numpy.append(my_first, len(ts_bins)))
+
+    # Where the regular time stamp already exists, keep its (first) value:
+    is_exact = numpy.flatnonzero(ts_offsets % ts_mode == 0)
+    exact_bins, first = numpy.unique(ts_bins[is_exact], return_index=True)
+    ts_data[numpy.searchsorted(my_bins, exact_bins)] = (
+        data_orig[is_exact[first]])
+    ts_data[0] = data_orig[0]
+
+    is_nonzero = ts_data != 0
+    return SparseSeries(ts_orig[0], ts_mode, ts_bins[-1] + 1,
+                        my_bins[is_nonzero], ts_data[is_nonzero])
+
+
+def parse_rainfall_lines(lines, ts_format):
+    """
+    Name:     parse_rainfall_lines
+    Input:    - list, two-column text lines (lines)
+              - tuple, timestamp format (ts_format)
+    Output:   numpy.ndarray, rainfall time series
+    Features: Parses lines of comma-separated timestamps and rainfall amounts
+              into a structured array (see RAIN_DTYPE) with a single call to
+              numpy.loadtxt on purely numeric text
+    Depends:  get_timestamp_format
+    """
+    order, num_fields = ts_format
+
+    # Turn the date and time separators into whitespace, keeping the signs
+    # of negative numbers (any minus after the comma, with or without
+    # leading whitespace, or in an exponent), and read every field as a
+    # number:
+    text = "".join(lines)
+    if lines and lines[0].count(',') > 1:
+        # Only the first two columns are read:
+        text = re.sub(r'^([^,\n]*,[^,\n]*),.*$', r'\1', text, flags=re.M)
+    text = re.sub(r'(,[ \t]*)-', '\\1\x00', text)
+    for sign in ('e-', 'E-'):
+        text = text.replace(sign, sign[:-1] + '\x00')
+    text = text.translate(PARSE_TABLE)
+    if not text.strip():
+        return numpy.zeros(0, dtype=RAIN_DTYPE)
+    values = numpy.loadtxt(io.StringIO(text), dtype=numpy.float64, ndmin=2)
+    if values.shape[1] < num_fields + 1:
+        raise ValueError("Error! Could not process rainfall data!")
+
+    # Build the timestamps from their components:
+    fields = values[:, :num_fields].astype(numpy.int64)
+    year = fields[:, order.index('year')]
+    month = fields[:, order.index('month')]
+    day = fields[:, order.index('day')]
+    if ((month < 1) | (month > 12) | (day < 1) | (day > 31) |
+            (fields[:, 3] > 23) | (fields[:, 4] > 59) |
+            (fields[:, num_fields - 1] > 59)).any():
+        raise ValueError("Error! Could not process time stamp!")
+
+    # Days past the end of their month (e.g., February 31) are invalid:
+    months = (12*(year - 1970) + month - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day - 1)
+    if (dates.astype('datetime64[M]') != months).any():
+        raise ValueError("Error! Could not process time stamp!")
+    seconds = dates.astype(numpy.int64)*86400
+    seconds += 3600*fields[:, 3] + 60*fields[:, 4]
+    if num_fields == 6:
+        seconds += fields[:, 5]
+
+    my_data = numpy.zeros(len(values), dtype=RAIN_DTYPE)
+    my_data['timestamps'] = seconds.astype('datetime64[s]')
+    my_data['rain'] = values[:, num_fields]
+    return my_data
+
+
+def process_gauge(rain_file, usgs=False, make_regular=False, mit=MIT,
+                  cache_dir=None, cache_size=CACHE_SIZE, is_rate=False,
+                  durations=DURATIONS, return_periods=RETURN_PERIODS):
+    """
+    Name:     process_gauge
+    Input:    - str, rainfall file (rain_file)
+              - bool, file is a USGS raingage file (usgs)
+              - bool, make a regular time series (make_regular)
+              - float, minimum inter-event time, hours (mit)
+              - [optional] str, cache directory (cache_dir)
+              - int, maximum size of the cache directory, bytes (cache_size)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+    Output:   numpy.ndarray, IDF matrix (durations x return periods)
+    Features: Returns the IDF matrix for a single rain gauge file
+    Depends:  - compute_idf
+              - load_rainfall
+    """
+    my_data = load_rainfall(rain_file, usgs, make_regular,
+                            cache_dir=cache_dir, cache_size=cache_size)
+    return compute_idf(my_data['timestamps'], my_data['rain'], durations,
+                       return_periods, mit, is_rate)
+
+
+def query_idf(url, gauge, durations=None, return_periods=None, mit=None,
+              timeout=60):
+    """
+    Name:     query_idf
+    Input:    - str, server address, e.g., http://localhost:8080 (url)
+              - str, rainfall file, relative to the served directory (gauge)
+              - [optional] list, durations, minutes (durations)
+              - [optional] list, return periods, years (return_periods)
+              - [optional] float, minimum inter-event time, hours (mit)
+              - float, time limit of the request, seconds (timeout)
+    Output:   dict, IDF query result (see IDFService.query)
+    Features: Returns the IDF matrix of a rain gauge from a server started
+              with serve_idf; parameters that are not given take the
+              server's defaults
+    """
+    import urllib.error
+    import urllib.parse
+    import urllib.request
+
+    params = {'gauge': gauge}
+    if durations is not None:
+        params['durations'] = ",".join("%g" % (d) for d in durations)
+    if return_periods is not None:
+        params['return_periods'] = ",".join(
+            "%g" % (t) for t in return_periods)
+    if mit is not None:
+        params['mit'] = "%g" % (mit)
+    my_url = "%s/idf?%s" % (url.rstrip("/"), urllib.parse.urlencode(params))
+    try:
+        with urllib.request.urlopen(my_url, timeout=timeout) as f:
+            result = json.load(f)
+    except urllib.error.HTTPError as e:
+        raise ValueError("IDF query failed (%d): %s" % (
+            e.code, json.load(e).get('error', e.reason)))
+    result['idf'] = numpy.array(result['idf'])
+    return result
+
+
+def read_rainfall(rain_file, chunk_size=CHUNK_SIZE):
+    """
+    Name:     read_rainfall
+    Input:    - str, two-column rainfall file with header (rain_file)
+              - int, number of lines per chunk (chunk_size)
+    Output:   numpy.ndarray, rainfall time series
+    Features: Reads a comma-separated rainfall file (datetime and rainfall
+              amount) in chunks, returning a structured array of
+              numpy.datetime64 timestamps and rainfall amounts
+    Depends:  iter_rainfall_chunks
+    """
+    with open(rain_file, 'r') as f:
+        f.readline()
+        chunks = list(iter_rainfall_chunks(f, chunk_size))
+
+    if chunks:
+        return numpy.concatenate(chunks)
+    else:
+        return numpy.zeros(0, dtype=RAIN_DTYPE)
+
+
+def read_usgs(input_file, output_file=None, chunk_size=CHUNK_SIZE):
+    """
+    Name:     read_usgs
+    Input:    - str, USGS rainfall file (input_file)
+              - [optional] str, CSV file to save output (output_file)
+              - int, number of lines per chunk (chunk_size)
+    Output:   numpy.ndarray, rainfall time series
+    Features: Reads a tab-separated USGS rainfall file in a single pass,
+              parsing the converted lines in chunks as they are streamed
+    Depends:  - iter_rainfall_chunks
+              - iter_usgs_lines
+    """
+    chunks = list(iter_rainfall_chunks(
+        iter_usgs_lines(input_file, output_file), chunk_size))
+    if chunks:
+        return numpy.concatenate(chunks)
+    else:
+        return numpy.zeros(0, dtype=RAIN_DTYPE)
+
+
+def run_batch(rain_files, workers=None, **kwargs):
+    """
+    Name:     run_batch
+    Input:    - list, rainfall files (rain_files)
+              - [optional] int, number of worker processes (workers)
+              - keyword arguments for process_gauge (kwargs)
+    Output:   tuple, dict of IDF matrices and dict of errors by file name
+    Features: Computes the IDF matrices of many rain gauges across a pool of
+              processes; a gauge that fails is reported in the errors
+              without stopping the others
+    Depends:  - init_worker
+              - process_gauge
+    """
+    import concurrent.futures
+
+    results = {}
+    errors = {}
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker,
+            initargs=(USE_JIT,)) as pool:
+        futures = {}
+        for rain_file in rain_files:
+            my_future = pool.submit(process_gauge, rain_file, **kwargs)
+            futures[my_future] = rain_file
+        for my_future in concurrent.futures.as_completed(futures):
+            rain_file = futures[my_future]
+            try:
+                results[rain_file] = my_future.result()
+            except Exception as e:
+                errors[rain_file] = "%s: %s" % (type(e).__name__, e)
+                print("Warning: Could not process %s (%s)" % (
+                    rain_file, errors[rain_file]))
+
+    return (results, errors)
+
+
+def save_cache(data, cache_file, max_size=CACHE_SIZE):
+    """
+    Name:     save_cache
+    Input:    - numpy.ndarray, rainfall time series (data)
+              - str, cache file name (cache_file)
+              - int, maximum size of the cache directory, bytes (max_size)
+    Output:   None
+    Features: Saves a rainfall time series to a cache file, removing cache
+              files of older versions of the same rainfall file and evicting
+              the least recently used files beyond the cache size limit
+    Depends:  evict_cache
+    """
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Invalidate the stale versions of the cached series (another process
+    # may have removed them already):
+    my_prefix = os.path.basename(cache_file).rsplit('-', 1)[0]
+    for old_file in glob.glob(os.path.join(cache_dir, my_prefix + "-*.npy")):
+        if old_file != cache_file:
+            try:
+                os.remove(old_file)
+            except OSError:
+                continue
+
+    # Write to a temporary file first so readers never see partial files:
+    temp_file = "%s.%d.tmp" % (cache_file, os.getpid())
+    try:
+        with open(temp_file, 'wb') as f:
+            numpy.save(f, numpy.ascontiguousarray(data))
+        os.replace(temp_file, cache_file)
+    except IOError:
+        if os.path.isfile(temp_file):
+            os.remove(temp_file)
+        print("Warning: Could not write cache file %s" % (cache_file))
+    else:
+        evict_cache(cache_dir, max_size)
+
+
+def save_results(out_prefix, idf, idc, events, maxima,
+                 durations=DURATIONS, return_periods=RETURN_PERIODS,
+                 event_times=None, formats=("npz", "csv")):
+    """
+    Name:     save_results
+    Input:    - str, output file name prefix (out_prefix)
+              - numpy.ndarray, IDF matrix (idf)
+              - numpy.ndarray, intensity-duration matrix (idc)
+              - numpy.ndarray, event table (events)
+              - numpy.ndarray, event maxima for each duration (maxima)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - [optional] numpy.ndarray, event start and end times
+                (event_times)
+              - tuple, output formats: "npz", "csv" and/or "parquet"
+                (formats)
+    Output:   list, names of the files written
+    Features: Saves the IDF matrix, the intensity-duration matrix and the
+              event table with its duration maxima:
+              * npz: a single NumPy archive of all arrays
+              * csv: {out_prefix}_idf.csv, _idc.csv and _events.csv
+              * parquet: {out_prefix}_idf.parquet and _events.parquet
+    Depends:  - get_pyarrow
+              - make_event_columns
+              - write_columns
+    """
+    durations = numpy.asarray(durations, dtype=numpy.float64)
+    return_periods = numpy.asarray(return_periods, dtype=numpy.float64)
+    idf_columns = {'duration_min': durations}
+    for q in range(len(return_periods)):
+        idf_columns['intensity_%gyr_in_hr' % (return_periods[q])] = idf[:, q]
+    idc_columns = {'duration_min': idc[0], 'max_rain_in': idc[1],
+                   'intensity_in_hr': idc[2]}
+    event_columns = make_event_columns(events, maxima, durations, event_times)
+
+    out_files = []
+    for my_format in formats:
+        if my_format == "npz":
+            my_file = out_prefix + ".npz"
+            my_arrays = {}
+            if event_times is not None:
+                my_arrays['event_times'] = event_times
+            numpy.savez(
+                my_file, idf=idf, idc=idc, events=events, maxima=maxima,
+                durations=durations, return_periods=return_periods,
+                **my_arrays)
+            out_files.append(my_file)
+        elif my_format == "csv":
+            for my_name, my_columns in (("idf", idf_columns),
+                                        ("idc", idc_columns),
+                                        ("events", event_columns)):
+                my_file = "%s_%s.csv" % (out_prefix, my_name)
+                write_columns(my_file, my_columns)
+                out_files.append(my_file)
+        elif my_format == "parquet":
+            pyarrow, parquet = get_pyarrow()
+            for my_name, my_columns in (("idf", idf_columns),
+                                        ("events", event_columns)):
+                my_file = "%s_%s.parquet" % (out_prefix, my_name)
+                parquet.write_table(pyarrow.table(my_columns), my_file)
+                out_files.append(my_file)
+        else:
+            raise ValueError("Unknown output format %s" % (my_format))
+
+    return out_files
+
+
+def scan_window_maxima(seconds, cum_rain, starts, ends, num_durations,
+                       window_sec, is_rate, maxima):
+    """
+    Name:     scan_window_maxima
+    Input:    - numpy.ndarray, epoch seconds (seconds)
+              - numpy.ndarray, cumulative rainfall (cum_rain)
+              - numpy.ndarray, starting sample of each event (starts)
+              - numpy.ndarray, ending sample of each event (ends)
+              - numpy.ndarray, number of durations each event is longer
+                than (num_durations)
+              - numpy.ndarray, window lengths in ascending order, seconds
+                (window_sec)
+              - bool, rainfall data is a rate, in/hr (is_rate)
+              - numpy.ndarray, maximum rainfall for each event and window
+                (maxima)
+    Output:   None
+    Features: Updates the maxima of the moving windows of each event (see
+              calc_window_maxima) with a window whose end follows its start
+              through the event; this is the kernel compiled by
+              get_jit_kernels and is slow in pure Python
+    """
+    for e in range(len(starts)):
+        for n in range(num_durations[e]):
+            if n > 0 and window_sec[n] == window_sec[n - 1]:
+                maxima[e, n] = maxima[e, n - 1]
+                continue
+            j = starts[e]
+            my_max = -numpy.inf
+            for i in range(starts[e], ends[e] - 1):
+                # Rates are not searched from between two dry samples:
+                if (is_rate and i > starts[e] and
+                        cum_rain[i - 1] == cum_rain[i] and
+                        cum_rain[i + 1] == cum_rain[i]):
+                    continue
+                while j < ends[e] and seconds[j] <= seconds[i] + window_sec[n]:
+                    j += 1
+                # A window without a second sample holds no rainfall:
+                my_end = j if j > i + 1 else i
+                if cum_rain[my_end] - cum_rain[i] > my_max:
+                    my_max = cum_rain[my_end] - cum_rain[i]
+            maxima[e, n] = my_max
+
+
+def serve_idf(root, host="localhost", port=8080, verbose=False, **kwargs):
+    """
+    Name:     serve_idf
+    Input:    - str, directory of the rainfall files (root)
+              - str, host name or address to listen on (host)
+              - int, port to listen on (port)
+              - bool, log each request (verbose)
+              - keyword arguments for IDFService (kwargs)
+    Output:   None
+    Features: Answers IDF queries over HTTP until interrupted, keeping the
+              rainfall series and duration maxima of each queried gauge in
+              memory; requests are served in threads, e.g.,
+              GET /idf?gauge=a.csv&durations=5,60&return_periods=2,10&mit=5
+    Depends:  IDFService
+    """
+    # The HTTP modules (and the request handler built on them) are only
+    # loaded when serving, keeping them out of every other run's start-up:
+    import http.server
+    import urllib.parse
+
+    class IDFRequestHandler(http.server.BaseHTTPRequestHandler):
+        """
+        Name:     IDFRequestHandler
+        Features: Answers the HTTP requests of serve_idf with JSON, reading
+                  the query parameters of GET /idf
+        """
+        def do_GET(self):
+            """
+            Name:     IDFRequestHandler.do_GET
+            Input:    None.
+            Output:   None
+            Features: Sends the IDF query result of a gauge; errors are
+                      sent with their status code and message
+            Depends:  IDFService.query
+            """
+            my_url = urllib.parse.urlparse(self.path)
+            params = urllib.parse.parse_qs(my_url.query)
+            service = self.server.service
+            try:
+                if my_url.path != "/idf":
+                    raise LookupError("Unknown path %s" % (my_url.path))
+                if 'gauge' not in params:
+                    raise ValueError("Missing gauge parameter")
+                durations = service.durations
+                if 'durations' in params:
+                    durations = [
+                        float(d) for d in params['durations'][0].split(",")]
+                return_periods = service.return_periods
+                if 'return_periods' in params:
+                    return_periods = [
+                        float(t)
+                        for t in params['return_periods'][0].split(",")]
+                mit = service.mit
+                if 'mit' in params:
+                    mit = float(params['mit'][0])
+                result = service.query(
+                    params['gauge'][0], durations, return_periods, mit)
+            except LookupError as e:
+                self.send_json(404, {'error': str(e)})
+            except ValueError as e:
+                self.send_json(400, {'error': str(e)})
+            except Exception as e:
+                self.send_json(
+                    500, {'error': "%s: %s" % (type(e).__name__, e)})
+            else:
+                result['idf'] = result['idf'].tolist()
+                self.send_json(200, result)
+
+        def log_message(self, format, *args):
+            """
+            Name:     IDFRequestHandler.log_message
+            Input:    - str, message format (format)
+                      - arguments of the message (args)
+            Output:   None
+            Features: Logs a request only if the server is verbose
+            """
+            if self.server.verbose:
+                http.server.BaseHTTPRequestHandler.log_message(
+                    self, format, *args)
+
+        def send_json(self, status, result):
+            """
+            Name:     IDFRequestHandler.send_json
+            Input:    - int, HTTP status code (status)
+                      - dict, response (result)
+            Output:   None
+            Features: Sends a response as JSON
+            """
+            my_body = json.dumps(result).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(my_body)))
+            self.end_headers()
+            self.wfile.write(my_body)
+
+    server = http.server.ThreadingHTTPServer(
+        (host, port), IDFRequestHandler, bind_and_activate=False)
+    server.daemon_threads = True
+
+    # Queue bursts of concurrent clients rather than refusing them:
+    server.request_queue_size = 128
+    try:
+        server.server_bind()
+        server.server_activate()
+    except OSError:
+        server.server_close()
+        raise
+    server.service = IDFService(root, **kwargs)
+    server.verbose = verbose
+    print("Serving IDF queries for %s on http://%s:%d/idf" % (
+        server.service.root, host, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
 def string_to_date(x):
     """
     Name:     string_to_date
@@ -182,6 +2248,20 @@ def string_to_date(x):
         return d
 
 
+def to_seconds(x):
+    """
+    Name:     to_seconds
+    Input:    numpy.ndarray, timestamps (x)
+    Output:   numpy.ndarray, epoch seconds
+    Features: Returns timestamps (datetime objects or numpy.datetime64) as
+              integer seconds since 1970-01-01
+    """
+    x = numpy.asarray(x)
+    if x.dtype.kind in ('O', 'M'):
+        x = x.astype('datetime64[s]')
+    return x.astype(numpy.int64, copy=False)
+
+
 def usgs_to_csv(input_file, output_file):
     """
     Name:     usgs_to_csv
@@ -189,28 +2269,73 @@ def usgs_to_csv(input_file, output_file):
               - str, file to save output (output_file)
     Outputs:  None
     Features: Processes a tab-separated USGS rainfall data file to CSV format
-    Depends:  - writeline
-              - writeout
+    Depends:  iter_usgs_lines
     """
     if os.path.isfile(input_file):
-        # Prepare the output file (preserve original)
-        headerline="datetime,rainfall\n"
-        if os.path.isfile(output_file):
-            print("Warning: Overwriting file %s" % (output_file))
-        writeout(output_file, headerline)
-
-        with open(input_file, 'r') as f:
-            for line in f:
-                if line.startswith("U"):
-                    my_items = line.split("\t")
-                    # usgs file should have six columns beginning with 'USGS'
-                    # save only the datetime and rainfall amounts (cols 2&4)
-                    my_data = ','.join((my_items[2], my_items[4])) + '\n'
-                    writeline(output_file, my_data)
+        for line in iter_usgs_lines(input_file, output_file):
+            pass
     else:
         print("Warning: Could not find input file %s" % (input_file))
 
 
+def write_batch(out_file, results, durations=DURATIONS,
+                return_periods=RETURN_PERIODS, key_name="gauge"):
+    """
+    Name:     write_batch
+    Input:    - str, file name with path (out_file)
+              - dict, IDF matrices by rain gauge file (results)
+              - list, durations, minutes (durations)
+              - list, return periods, years (return_periods)
+              - str, column name of the results keys (key_name)
+    Output:   None
+    Features: Writes the IDF matrices of many rain gauges (or of any other
+              keys, e.g., MITs) to a single CSV table with one row per key,
+              duration and return period
+    """
+    gauges = sorted(results)
+    num_durs = len(durations)
+    num_freqs = len(return_periods)
+    my_lines = [
+        "%s,duration_min,return_period_yr,intensity_in_hr\n" % (key_name)]
+    for gauge in gauges:
+        idf = results[gauge]
+        for d in range(num_durs):
+            for q in range(num_freqs):
+                my_lines.append("%s,%g,%g,%0.6f\n" % (
+                    gauge, durations[d], return_periods[q], idf[d, q]))
+    writeout(out_file, "".join(my_lines))
+
+
+def write_columns(out_file, columns):
+    """
+    Name:     write_columns
+    Input:    - str, file name with path (out_file)
+              - dict, columns by name (columns)
+    Output:   None
+    Features: Writes named columns of equal length to a CSV file with header;
+              each column is formatted as a whole (timestamps in ISO 8601,
+              integers as is and floats to six decimal places)
+    Depends:  writeout
+    """
+    my_fields = []
+    for my_column in columns.values():
+        my_column = numpy.asarray(my_column)
+        if my_column.dtype.kind == 'M':
+            my_fields.append(numpy.datetime_as_string(my_column))
+        elif my_column.dtype.kind in 'iub':
+            my_fields.append(my_column.astype(str))
+        else:
+            my_fields.append(numpy.char.mod("%0.6f", my_column))
+
+    my_lines = [",".join(columns) + "\n"]
+    if my_fields and len(my_fields[0]) > 0:
+        my_rows = my_fields[0]
+        for my_field in my_fields[1:]:
+            my_rows = numpy.char.add(numpy.char.add(my_rows, ","), my_field)
+        my_lines.append("\n".join(my_rows.tolist()) + "\n")
+    writeout(out_file, "".join(my_lines))
+
+
 def writeline(f, d):
     """
     Name:     writeline
@@ -244,42 +2369,405 @@ def writeout(f, d):
 ###############################################################################
 # CLASSES:
 ###############################################################################
+class IDFService:
+    """
+    Name:     IDFService
+    Features: This class answers IDF queries for the rain gauge files of a
+              directory from memory; each gauge's rainfall series is parsed
+              on its first query and its rain events and duration maxima are
+              kept for the most recently queried MITs and sets of durations,
+              until the gauge's file changes
+    History:  Version 0.5.0
+              - created [26.10.17]
+    """
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Class Initialization
+    # ////////////////////////////////////////////////////////////////////////
+    def __init__(self, root, usgs=False, make_regular=False, is_rate=False,
+                 cache_dir=None, cache_size=CACHE_SIZE, durations=DURATIONS,
+                 return_periods=RETURN_PERIODS, mit=MIT, max_results=16):
+        """
+        Name:     IDFService.__init__
+        Input:    - str, directory of the rainfall files (root)
+                  - bool, files are USGS raingage files (usgs)
+                  - bool, make regular time series (make_regular)
+                  - bool, rainfall data are rates, in/hr (is_rate)
+                  - [optional] str, cache directory (cache_dir)
+                  - int, maximum size of the cache directory, bytes
+                    (cache_size)
+                  - list, default durations, minutes (durations)
+                  - list, default return periods, years (return_periods)
+                  - float, default minimum inter-event time, hours (mit)
+                  - int, number of event tables, maxima and IDF matrices
+                    kept for each gauge (max_results)
+        Output:   None
+        Features: Initializes an IDFService class object without gauges
+        """
+        if not os.path.isdir(root):
+            raise IOError("Could not find directory %s" % (root))
+        self.root = os.path.realpath(root)
+        self.usgs = usgs
+        self.make_regular = make_regular
+        self.is_rate = is_rate
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.durations = list(durations)
+        self.return_periods = list(return_periods)
+        self.mit = mit
+        self.max_results = max_results
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Class Function Definitions
+    # ////////////////////////////////////////////////////////////////////////
+    def get_gauge(self, gauge):
+        """
+        Name:     IDFService.get_gauge
+        Input:    str, rainfall file, relative to the root directory (gauge)
+        Output:   dict, gauge series and results
+        Features: Returns the resident gauge, which is (re-)loaded if it is
+                  new or its file has changed since it was loaded
+        Depends:  - cumulative_rain
+                  - load_rainfall
+                  - to_seconds
+        """
+        rain_file = os.path.realpath(os.path.join(self.root, gauge))
+        if (os.path.commonpath([rain_file, self.root]) != self.root or
+                not os.path.isfile(rain_file)):
+            raise LookupError("Could not find gauge %s" % (gauge))
+        my_stat = os.stat(rain_file)
+        file_key = (my_stat.st_size, my_stat.st_mtime_ns)
+
+        with self.lock:
+            my_gauge = self.gauges.get(rain_file)
+            if my_gauge is None or my_gauge['file_key'] != file_key:
+                my_gauge = {'file_key': file_key, 'lock': threading.Lock(),
+                            'seconds': None, 'events': {}, 'maxima': {},
+                            'idf': {}}
+                self.gauges[rain_file] = my_gauge
+
+        # Queries of other gauges are not held up while this one loads:
+        with my_gauge['lock']:
+            if my_gauge['seconds'] is None:
+                my_data = load_rainfall(
+                    rain_file, self.usgs, self.make_regular,
+                    cache_dir=self.cache_dir, cache_size=self.cache_size)
+                my_gauge['rain'] = numpy.array(my_data['rain'])
+                my_gauge['seconds'] = to_seconds(my_data['timestamps'])
+                my_gauge['cum_rain'] = cumulative_rain(
+                    my_gauge['rain'], my_gauge['seconds'], self.is_rate)
+        return my_gauge
+
+    def get_result(self, results, key, func, *args):
+        """
+        Name:     IDFService.get_result
+        Input:    - dict, results of a gauge (results)
+                  - tuple or float, result key (key)
+                  - function, computes the result (func)
+                  - arguments of the function (args)
+        Output:   result of the function
+        Features: Returns a resident result, marking it as the most recently
+                  used, or computes and keeps it, evicting the least recently
+                  used results beyond the limit (the gauge's lock is held)
+        """
+        if key in results:
+            results[key] = results.pop(key)
+        else:
+            results[key] = func(*args)
+            while len(results) > self.max_results:
+                del results[next(iter(results))]
+        return results[key]
+
+    def query(self, gauge, durations, return_periods, mit):
+        """
+        Name:     IDFService.query
+        Input:    - str, rainfall file, relative to the root directory (gauge)
+                  - list, durations, minutes (durations)
+                  - list, return periods, years (return_periods)
+                  - float, minimum inter-event time, hours (mit)
+        Output:   dict, gauge, mit, durations, return periods, number of
+                  events and IDF matrix (idf)
+        Features: Returns the IDF matrix of a gauge, finding its rain events,
+                  duration maxima and IDF matrix only if they are not
+                  resident
+        Depends:  - calc_duration_maxima
+                  - calc_idf
+                  - find_events
+                  - get_gauge
+                  - get_result
+        """
+        # NaN and infinity are neither meaningful nor valid in JSON:
+        if not all(math.isfinite(x) for x in
+                   list(durations) + list(return_periods) + [mit]):
+            raise ValueError(
+                "Durations, return periods and MIT must be finite")
+        durations = sorted(set(durations))
+        return_periods = sorted(set(return_periods))
+        if not durations or min(durations) <= 0:
+            raise ValueError("Durations must be positive")
+        if not return_periods or min(return_periods) < 1:
+            raise ValueError("Return periods must be at least one year")
+        if mit < 0:
+            raise ValueError("MIT must not be negative")
+
+        my_gauge = self.get_gauge(gauge)
+        my_key = (mit, tuple(durations))
+        idf_key = my_key + (tuple(return_periods),)
+        with my_gauge['lock']:
+            events = self.get_result(
+                my_gauge['events'], mit, find_events,
+                my_gauge['seconds'], my_gauge['rain'], mit, self.is_rate)
+            maxima = self.get_result(
+                my_gauge['maxima'], my_key, calc_duration_maxima,
+                my_gauge['seconds'], my_gauge['cum_rain'], events, durations,
+                self.is_rate)
+            idf = self.get_result(
+                my_gauge['idf'], idf_key, calc_idf,
+                maxima, durations, return_periods)
+
+        return {
+            'gauge': gauge,
+            'mit': mit,
+            'durations': durations,
+            'return_periods': return_periods,
+            'num_events': len(events),
+            'idf': idf,
+        }
+
+
+class IncrementalIDF:
+    """
+    Name:     IncrementalIDF
+    Features: This class keeps the rain events and their duration maxima of a
+              growing rainfall record, such that appending new samples only
+              re-segments the record from the last open event
+    History:  Version 0.5.0
+              - created [26.10.17]
+    """
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Class Initialization
+    # ////////////////////////////////////////////////////////////////////////
+    def __init__(self, durations=DURATIONS, mit=MIT, is_rate=False):
+        """
+        Name:     IncrementalIDF.__init__
+        Input:    - list, durations, minutes (durations)
+                  - float, minimum inter-event time, hours (mit)
+                  - bool, rainfall data is a rate, in/hr (is_rate)
+        Output:   None
+        Features: Initializes an empty IncrementalIDF class object
+        """
+        self.durations = list(durations)
+        self.mit = float(mit)
+        self.is_rate = bool(is_rate)
+        self.events = numpy.zeros(0, dtype=EVENT_DTYPE)     # event table
+        self.event_times = numpy.zeros((0, 2), dtype='datetime64[s]')
+        self.maxima = numpy.zeros((0, len(self.durations)))  # event maxima
+        self.tail = numpy.zeros(0, dtype=RAIN_DTYPE)  # samples kept open
+        self.offset = 0       # index of the first tail sample in the record
+        self.num_samples = 0  # number of samples in the record
+
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Class Function Definitions
+    # ////////////////////////////////////////////////////////////////////////
+    def append(self, data):
+        """
+        Name:     IncrementalIDF.append
+        Input:    numpy.ndarray, rainfall time series (data)
+        Output:   int, index of the first new or updated event
+        Features: Appends the samples after the end of the record, updating
+                  the last open event and adding the events that follow it;
+                  samples no later than the end of the record are skipped
+        Depends:  - calc_duration_maxima
+                  - cumulative_rain
+                  - find_events
+                  - to_seconds
+        """
+        if len(self.tail) > 0:
+            data = data[data['timestamps'] > self.tail['timestamps'][-1]]
+        tail = numpy.concatenate((self.tail, data))
+        seconds = to_seconds(tail['timestamps'])
+
+        # The open event (if any) starts the tail; re-segment it with the
+        # new samples in case they extend it:
+        first_event = len(self.events)
+        if first_event > 0 and self.events['start'][-1] >= self.offset:
+            first_event -= 1
+        my_events = find_events(seconds, tail['rain'], self.mit, self.is_rate)
+        my_maxima = calc_duration_maxima(
+            seconds, cumulative_rain(tail['rain'], seconds, self.is_rate),
+            my_events, self.durations, self.is_rate)
+        my_times = numpy.stack((tail['timestamps'][my_events['start']],
+                                tail['timestamps'][my_events['end']]), axis=1)
+        my_events['start'] += self.offset
+        my_events['end'] += self.offset
+        self.events = numpy.concatenate((self.events[:first_event], my_events))
+        self.event_times = numpy.concatenate(
+            (self.event_times[:first_event], my_times))
+        self.maxima = numpy.concatenate((self.maxima[:first_event], my_maxima))
+        self.num_samples += len(data)
+
+        # The last event stays open until the MIT has passed since its
+        # ending sample; otherwise, only the last sample is kept:
+        tail_start = len(tail) - 1
+        if len(my_events) > 0:
+            last_end = my_events['end'][-1] - self.offset
+            if seconds[-1] - seconds[last_end] <= self.mit*3600.0:
+                tail_start = my_events['start'][-1] - self.offset
+        self.tail = tail[max(tail_start, 0):]
+        self.offset += max(tail_start, 0)
+
+        return first_event
+
+    def append_file(self, rain_file, usgs=False, csv_file=None,
+                    chunk_size=CHUNK_SIZE):
+        """
+        Name:     IncrementalIDF.append_file
+        Input:    - str, rainfall file (rain_file)
+                  - bool, file is a USGS raingage file (usgs)
+                  - [optional] str, CSV file for formatted USGS data
+                    (csv_file)
+                  - int, number of lines per chunk (chunk_size)
+        Output:   int, index of the first new or updated event
+        Features: Appends a rainfall file chunk by chunk; events that
+                  straddle chunks are stitched by the open event, so memory
+                  is bounded by the chunk size plus the longest event
+        Depends:  iter_rainfall
+        """
+        first_event = len(self.events)
+        try:
+            for my_chunk in iter_rainfall(rain_file, usgs, csv_file,
+                                          chunk_size):
+                first_event = min(first_event, self.append(my_chunk))
+        except ValueError:
+            raise IOError("Could not read the input file. Check your format.")
+
+        return first_event
+
+    def calc_idf(self, return_periods=RETURN_PERIODS):
+        """
+        Name:     IncrementalIDF.calc_idf
+        Input:    list, return periods, years (return_periods)
+        Output:   numpy.ndarray, IDF matrix (durations x return periods)
+        Features: Returns the IDF matrix of the record
+        Depends:  calc_idf
+        """
+        if len(self.events) == 0:
+            raise ValueError("Error! No rain events found!")
+        return calc_idf(self.maxima, self.durations, return_periods)
+
+    @classmethod
+    def load(cls, state_file):
+        """
+        Name:     IncrementalIDF.load
+        Input:    str, state file name (state_file)
+        Output:   IncrementalIDF
+        Features: Returns the IncrementalIDF saved in a state file
+        """
+        with numpy.load(state_file) as my_state:
+            my_idf = cls(my_state['durations'].tolist(),
+                         my_state['mit'], my_state['is_rate'])
+            my_idf.events = my_state['events']
+            my_idf.event_times = my_state['event_times']
+            my_idf.maxima = my_state['maxima']
+            my_idf.tail = my_state['tail']
+            my_idf.offset = int(my_state['offset'])
+            my_idf.num_samples = int(my_state['num_samples'])
+        return my_idf
+
+    def save(self, state_file):
+        """
+        Name:     IncrementalIDF.save
+        Input:    str, state file name (state_file)
+        Output:   None
+        Features: Saves the event table, event start and end times, duration
+                  maxima and open samples to a NumPy .npz state file
+        """
+        # Write to a temporary file first so readers never see partial files:
+        temp_file = "%s.%d.tmp" % (state_file, os.getpid())
+        try:
+            with open(temp_file, 'wb') as f:
+                numpy.savez(
+                    f, durations=self.durations, mit=self.mit,
+                    is_rate=self.is_rate, events=self.events,
+                    event_times=self.event_times, maxima=self.maxima,
+                    tail=self.tail, offset=self.offset,
+                    num_samples=self.num_samples)
+            os.replace(temp_file, state_file)
+        finally:
+            if os.path.isfile(temp_file):
+                os.remove(temp_file)
+
+
 class PrecipEvent:
     """
     Name:     PrecipEvent
-    Features: This class handles rain events
+    Features: This class handles rain events as a view of the samples
+              between two indices of a shared rainfall time series
     History:  Version 0.3.1
               - updated minimum storm duration to five minutes [19.03.13]
+              Version 0.5.0
+              - store starting and ending indices instead of copies of the
+                event's timestamps and rainfall amounts
+              - calculate total rainfall from the cumulative rainfall
     """
     # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
     # Variable Initialization
     # ////////////////////////////////////////////////////////////////////////
     MINIMUM_DURATION = 5.0/60.0  # hours
 
+    __slots__ = ('_timestamps', '_rain', '_cum_rain', '_cum_start', 'start',
+                 'end', 'is_rate', 'duration', 'points', 'total_rain')
+
     # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
     # Class Initialization
     # ////////////////////////////////////////////////////////////////////////
-    def __init__(self, is_rate):
+    def __init__(self, timestamps, rain, start, end, is_rate=False,
+                 cum_rain=None):
         """
         Name:     PrecipEvent.__init__
-        Input:    is_rate, bool:
+        Input:    - numpy.ndarray, timestamps of the time series (timestamps)
+                  - numpy.ndarray, rainfall of the time series (rain)
+                  - int, index of the event's first sample (start)
+                  - int, index of the event's last sample (end)
+                  - is_rate, bool:
                     True - data is a rate (i.e., in/hr)
                     False - data is amount (i.e., in)
+                  - [optional] numpy.ndarray, cumulative rainfall of the
+                    time series (cum_rain); see cumulative_rain
         Output:   None
         Features: Initializes a PrecipEvent class object
         """
         # Initialization:
-        self.time = []       # list of timestamps for rain event
-        self.rain = []       # list of rainfall quantities for rain event
+        self._timestamps = timestamps  # shared timestamps
+        self._rain = rain              # shared rainfall quantities
+        self.start = int(start)        # index of the event's first sample
+        self.end = int(end)            # index of the event's last sample
         self.duration = 0    # duration of rain event (hrs)
         self.points = 0      # number of data points found for rain event
         self.total_rain = 0  # total rainfall amount (inches)
-        self.IDFdurations = []  # list of durations for IDF analysis
-        self.IDFrainfalls = []  # list of max rainfalls for each IDF duration
 
         # Set integration method based on source:
         self.is_rate = is_rate
 
+        # Cumulative rainfall and the index of its first sample; without a
+        # shared cumulative rainfall, it is computed for the event when needed
+        self._cum_rain = cum_rain
+        self._cum_start = 0
+
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Property Definitions
+    # ////////////////////////////////////////////////////////////////////////
+    @property
+    def time(self):
+        """Timestamps for rain event (view of the shared timestamps)"""
+        return self._timestamps[self.start:self.end + 1]
+
+    @property
+    def rain(self):
+        """Rainfall quantities for rain event (view of the shared rainfall)"""
+        return self._rain[self.start:self.end + 1]
+
     # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
     # Class Function Definitions
     # ////////////////////////////////////////////////////////////////////////
@@ -288,7 +2776,7 @@ class PrecipEvent:
         Name:     PrecipEvent.calc_duration
         Features: Calculates the storm duration in hours
         """
-        if len(self.time) > 1:
+        if self.end > self.start:
             # Due to the ambiguity of when rainfall actually starts (i.e.,
             # sometime between self.time[0] and self.time[1]) and when it
             # ends (i.e., sometime between self.time[-2] and self.time[-1]),
@@ -296,14 +2784,11 @@ class PrecipEvent:
             #   1. rainfall begins immediately before the first indication
             #   2. rainfall ends immediately after the last indication
             #   3. the minumum duration for an event is defined above
-            rain_array = numpy.array(self.rain)
-            rain_events = numpy.where(rain_array > 0)[0]
-            start_index = rain_events[0]
-            end_index = rain_events[-1]
-            if start_index != end_index:
-                start_time = self.time[start_index]
-                end_time = self.time[end_index]
-                self.duration = (end_time - start_time).total_seconds()/3600.0
+            rain_events = numpy.flatnonzero(self.rain > 0)
+            if len(rain_events) > 1:
+                start_time, end_time = to_seconds(
+                    self.time[rain_events[[0, -1]]])
+                self.duration = (end_time - start_time)/3600.0
             else:
                 # Found single positive rain event:
                 self.duration = self.MINIMUM_DURATION
@@ -317,11 +2802,8 @@ class PrecipEvent:
         Output:   int, number of points
         Features: Calculates the total number of points found for rain event
         """
-        if len(self.time) == len(self.rain):
-            self.points = len(self.time)
-            return len(self.time)
-        else:
-            print("Warning! Timestamps and rainfall amounts are unmatched!")
+        self.points = self.end - self.start + 1
+        return self.points
 
     def calc_total_rain(self, start=None, end=None):
         """
@@ -346,23 +2828,276 @@ class PrecipEvent:
 
         if m > n:
             raise ValueError("Ending index must be after starting index!")
-        if n > self.points-1:
+        if n > self.calc_points()-1:
             raise ValueError("Out of index error")
 
-        if m == n:
-            self.total_rain = 0.0
-        elif self.is_rate:
-            self.total_rain = 0.0
-            for i in range(m, n):
-                # Rainfall data is given in units of in/hr, use the trapezoidal
-                # rule for non-uniform grids:
-                delta_t = (
-                    self.time[i+1] - self.time[i]).total_seconds()/3600.0
-                self.total_rain += 0.5*(self.rain[i] + self.rain[i+1])*delta_t
+        if self._cum_rain is None:
+            self._cum_rain = cumulative_rain(
+                self.rain, to_seconds(self.time), self.is_rate)
+            self._cum_start = self.start
+
+        # Rainfall data given in units of in/hr are integrated with the
+        # trapezoidal rule for non-uniform grids; rainfall data given as
+        # total rainfall per unit time (in) are summed:
+        m += self.start - self._cum_start
+        n += self.start - self._cum_start
+        self.total_rain = float(self._cum_rain[n] - self._cum_rain[m])
+
+
+class SparseSeries:
+    """
+    Name:     SparseSeries
+    Features: This class holds a regular rainfall time series as the indices
+              and values of its nonzero samples only, such that dry spells
+              are gaps between indices rather than stored samples
+    History:  Version 0.5.0
+              - created [26.10.17]
+    """
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Variable Initialization
+    # ////////////////////////////////////////////////////////////////////////
+    __slots__ = ('start', 'step', 'num_samples', 'indices', 'values',
+                 '_cum_rain')
+
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Class Initialization
+    # ////////////////////////////////////////////////////////////////////////
+    def __init__(self, start, step, num_samples, indices, values):
+        """
+        Name:     SparseSeries.__init__
+        Input:    - int, epoch seconds of the first sample (start)
+                  - int, time between samples, seconds (step)
+                  - int, number of samples (num_samples)
+                  - numpy.ndarray, increasing indices of the nonzero samples
+                    (indices)
+                  - numpy.ndarray, rainfall of the nonzero samples (values)
+        Output:   None
+        Features: Initializes a SparseSeries class object
+        """
+        self.start = int(start)
+        self.step = int(step)
+        self.num_samples = int(num_samples)
+        self.indices = numpy.asarray(indices, dtype=numpy.int64)
+        self.values = numpy.asarray(values, dtype=numpy.float64)
+
+        # Positive rainfall accumulated before each nonzero sample:
+        self._cum_rain = numpy.zeros(len(self.values) + 1)
+        numpy.cumsum(numpy.where(self.values > 0, self.values, 0.0),
+                     out=self._cum_rain[1:])
+
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Class Function Definitions
+    # ////////////////////////////////////////////////////////////////////////
+    @classmethod
+    def from_dense(cls, data):
+        """
+        Name:     SparseSeries.from_dense
+        Input:    numpy.ndarray, regular rainfall time series (data)
+        Output:   SparseSeries
+        Features: Returns the sparse copy of a regular rainfall time series
+        Depends:  to_seconds
+        """
+        seconds = to_seconds(data['timestamps'])
+        deltas = numpy.unique(numpy.diff(seconds))
+        if len(deltas) > 1 or (len(deltas) == 1 and deltas[0] <= 0):
+            raise ValueError(
+                "Error! Sparse series require a regular time series!")
+        step = deltas[0] if len(deltas) == 1 else 1
+        indices = numpy.flatnonzero(data['rain'] != 0)
+        return cls(seconds[0] if len(seconds) else 0, step, len(data),
+                   indices, data['rain'][indices])
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """
+        Name:     SparseSeries.from_chunks
+        Input:    iterable, regular rainfall time series chunks (chunks)
+        Output:   SparseSeries
+        Features: Returns the sparse copy of a regular rainfall time series
+                  read in chunks (see iter_rainfall), such that only one
+                  chunk of dry samples is held in memory at a time
+        Depends:  to_seconds
+        """
+        start = None
+        step = None
+        num_samples = 0
+        indices = [numpy.zeros(0, dtype=numpy.int64)]
+        values = [numpy.zeros(0)]
+        for my_chunk in chunks:
+            if len(my_chunk) == 0:
+                continue
+            seconds = to_seconds(my_chunk['timestamps'])
+            if start is None:
+                start = seconds[0]
+            else:
+                # Include the step from the previous chunk's last sample:
+                seconds = numpy.insert(seconds, 0, last_second)
+            last_second = seconds[-1]
+            deltas = numpy.unique(numpy.diff(seconds))
+            if step is None and len(deltas) > 0:
+                step = deltas[0]
+            if len(deltas) > 1 or (len(deltas) == 1 and (
+                    deltas[0] <= 0 or deltas[0] != step)):
+                raise ValueError(
+                    "Error! Sparse series require a regular time series!")
+            my_nonzero = numpy.flatnonzero(my_chunk['rain'] != 0)
+            indices.append(my_nonzero + num_samples)
+            values.append(my_chunk['rain'][my_nonzero])
+            num_samples += len(my_chunk)
+        return cls(0 if start is None else start,
+                   1 if step is None else step, num_samples,
+                   numpy.concatenate(indices), numpy.concatenate(values))
+
+    def cumulative_rain(self, idx, is_rate=False):
+        """
+        Name:     SparseSeries.cumulative_rain
+        Input:    - numpy.ndarray, sample indices (idx)
+                  - bool, rainfall data is a rate, in/hr (is_rate)
+        Output:   numpy.ndarray, cumulative rainfall
+        Features: Returns the cumulative rainfall at the given samples (see
+                  cumulative_rain); for rates, the trapezoidal integral over
+                  regular samples is half the sum of the accumulated rates
+                  before and after a sample less the first rate
+        """
+        idx = numpy.asarray(idx)
+        cum_rain = self._cum_rain[numpy.searchsorted(self.indices, idx)]
+        if is_rate:
+            first_rate = self._cum_rain[numpy.searchsorted(self.indices, 1)]
+            cum_rain = cum_rain + self._cum_rain[
+                numpy.searchsorted(self.indices, idx + 1)]
+            cum_rain -= first_rate
+            cum_rain *= 0.5*self.step/3600.0
+        return cum_rain
+
+    def timestamps(self, idx):
+        """
+        Name:     SparseSeries.timestamps
+        Input:    numpy.ndarray, sample indices (idx)
+        Output:   numpy.ndarray, timestamps
+        Features: Returns the timestamps of the given samples
+        """
+        seconds = self.start + self.step*numpy.asarray(idx, dtype=numpy.int64)
+        return seconds.astype('datetime64[s]')
+
+    def to_dense(self):
+        """
+        Name:     SparseSeries.to_dense
+        Input:    None.
+        Output:   numpy.ndarray, rainfall time series
+        Features: Returns the regular rainfall time series with every sample
+        """
+        my_data = numpy.zeros(self.num_samples, dtype=RAIN_DTYPE)
+        my_data['timestamps'] = self.timestamps(numpy.arange(self.num_samples))
+        my_data['rain'][self.indices] = self.values
+        return my_data
+
+
+class StageProfiler:
+    """
+    Name:     StageProfiler
+    Features: This class records the wall time, CPU time, peak memory and
+              throughput of each stage of the IDF pipeline
+    History:  Version 0.5.0
+              - created [26.10.17]
+    """
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Class Initialization
+    # ////////////////////////////////////////////////////////////////////////
+    def __init__(self, enabled=True, trace_memory=False):
+        """
+        Name:     StageProfiler.__init__
+        Input:    - bool, record the stages (enabled)
+                  - bool, trace the peak Python/NumPy memory of each stage
+                    with tracemalloc (trace_memory)
+        Output:   None
+        Features: Initializes a StageProfiler class object; a disabled
+                  profiler runs the stages without recording them; note that
+                  tracing memory slows down parsing several times over
+        """
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    # \\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\\
+    # Class Function Definitions
+    # ////////////////////////////////////////////////////////////////////////
+    def get_max_rss(self):
+        """
+        Name:     StageProfiler.get_max_rss
+        Input:    None.
+        Output:   int, peak resident set size, bytes (or None if unknown)
+        Features: Returns the peak resident set size of the process
+        """
+        try:
+            import resource
+        except ImportError:
+            return None
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            return max_rss
         else:
-            # Rainfall data is given as total rainfall per unit time (in)
-            rain_amounts = numpy.array(self.rain[m:n])
-            self.total_rain = rain_amounts.sum()
+            return 1024*max_rss
+
+    def save(self, out_file, **kwargs):
+        """
+        Name:     StageProfiler.save
+        Input:    - str, output file name (out_file)
+                  - keyword arguments saved with the stages (kwargs)
+        Output:   None
+        Features: Saves the recorded stages to a JSON file
+        """
+        my_profile = dict(kwargs)
+        my_profile['stages'] = self.stages
+        with open(out_file, 'w') as f:
+            json.dump(my_profile, f, indent=2)
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None, events=None):
+        """
+        Name:     StageProfiler.stage
+        Input:    - str, stage name (name)
+                  - [optional] int, number of rainfall samples (rows)
+                  - [optional] int, number of rain events (events)
+        Output:   dict, stage record; the number of rows and events may be
+                  set within the stage
+        Features: Context manager that records a stage of the pipeline
+        """
+        my_stage = {'stage': name, 'rows': rows, 'events': events}
+        if not self.enabled:
+            yield my_stage
+            return
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            mem_start = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield my_stage
+        finally:
+            my_stage['wall_s'] = time.perf_counter() - wall_start
+            my_stage['cpu_s'] = time.process_time() - cpu_start
+            if self.trace_memory:
+                my_stage['peak_traced_bytes'] = (
+                    tracemalloc.get_traced_memory()[1] - mem_start)
+            my_stage['max_rss_bytes'] = self.get_max_rss()
+            for my_key in ('rows', 'events'):
+                if my_stage[my_key] is not None and my_stage['wall_s'] > 0:
+                    my_stage[my_key + '_per_s'] = (
+                        my_stage[my_key]/my_stage['wall_s'])
+            self.stages.append(my_stage)
+
+    def stop(self):
+        """
+        Name:     StageProfiler.stop
+        Input:    None.
+        Output:   None
+        Features: Stops tracing memory allocations
+        """
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
 
 
 ###############################################################################
@@ -374,326 +3109,381 @@ if __name__ == '__main__':
     p = argparse.ArgumentParser(description="IDF.py - Calculate IDF curves from rainfall data.")
     p.add_argument("file", help="input rainfall file; format should be two-column (datetime and rainfall amount) comma-separated plain text")
     p.add_argument("--usgs", action='store_true', help="input file format is based on USGS raingage station; the script will format the file for you")
+    p.add_argument("--no_csv", action="store_true", help="do not save the formatted USGS raingage file to CSV")
     p.add_argument("--make_regular", action="store_true", help="make regular irregular time stamped rainfall.")
+    p.add_argument("--sparse", action="store_true", help="hold only the nonzero samples of the (regular) rainfall series, finding the rain events and duration maxima without zero-filled dry spells; the file is read in chunks unless --make_regular or --cache is given")
+    p.add_argument("--mit", type=float, default=MIT, help="minimum inter-event time, hours (default: %(default)g)")
+    p.add_argument("--mit_sweep", type=float, nargs="+", metavar="MIT", help="compute the IDF matrix for each of these minimum inter-event times (hours) in a single pass and save them to a CSV table")
+    p.add_argument("--sweep_out", default="idf_mit_sweep.csv", help="CSV file for the MIT sweep table (default: %(default)s)")
+    p.add_argument("--durations", type=float, nargs="+", default=DURATIONS, metavar="MIN", help="rainfall durations, minutes (default: %s)" % (" ".join(map(str, DURATIONS))))
+    p.add_argument("--return_periods", type=float, nargs="+", default=RETURN_PERIODS, metavar="YR", help="return periods, years (default: %s)" % (" ".join(map(str, RETURN_PERIODS))))
+    p.add_argument("--series", choices=["events", "ams", "pds"], default="events", help="rainfall maxima the return periods are fitted to: every rain event's (events), each year's (ams, annual maximum series; rain events are not found) or the rain events' above the threshold (pds, partial duration series) (default: %(default)s)")
+    p.add_argument("--threshold", type=float, default=0.0, metavar="IN_HR", help="rainfall intensity threshold of the partial duration series, in/hr (default: %(default)g)")
+    p.add_argument("--rate", action="store_true", help="rainfall data are rates (in/hr), e.g., from a disdrometer, rather than amounts (in)")
+    p.add_argument("--cache", action="store_true", help="cache the parsed rainfall series next to the input file")
+    p.add_argument("--cache_dir", help="cache the parsed rainfall series in this directory")
+    p.add_argument("--cache_size", type=float, default=CACHE_SIZE/2**20, help="maximum size of the cache directory, MB (default: %(default)d)")
+    p.add_argument("--batch", action="store_true", help="process every rain gauge file in a directory (or matching a quoted glob pattern) given as the input file")
+    p.add_argument("--workers", type=int, help="number of worker processes for batch mode, bootstrap replicates and duration maxima (default: number of CPUs; duration maxima are computed in a single process unless set)")
+    p.add_argument("--serve", metavar="[HOST:]PORT", help="serve IDF queries over HTTP for the rainfall files in the directory given as the input file, e.g., GET /idf?gauge=a.csv&durations=5,60&mit=5 (the other settings are the defaults)")
+    p.add_argument("--grid", action="store_true", help="input file is a gridded rainfall cube (time x rows x columns) in a .npy or netCDF file; saves the IDF cube (cells x durations x return periods) to PREFIX_grid.npz (see --output)")
+    p.add_argument("--grid_var", default="precip", help="rainfall variable of a netCDF grid (default: %(default)s)")
+    p.add_argument("--grid_start", metavar="DATETIME", help="time of the first sample of a .npy grid, e.g., 2010-01-01T00:00")
+    p.add_argument("--grid_step", type=float, metavar="MIN", help="time between samples of a .npy grid, minutes")
+    p.add_argument("--tile_size", type=int, metavar="CELLS", help="number of grid cells processed at a time, as whole rows or blocks of columns (default: about %d samples per tile)" % (CHUNK_SIZE))
+    p.add_argument("--batch_out", default="idf_batch.csv", help="CSV file for the batch results table (default: %(default)s)")
+    p.add_argument("--state", help="append the input file to the rain events saved in this state file (created if missing), reprocessing only the new samples")
+    p.add_argument("--chunk_size", type=int, metavar="N", help="stream the input file in chunks of N lines instead of loading the whole record (memory is bounded by the chunk size plus the longest event)")
+    p.add_argument("--bootstrap", type=int, default=0, metavar="N", help="report confidence bands from N bootstrap replicates of the rain events")
+    p.add_argument("--ci", type=float, default=95.0, help="confidence level of the bootstrap bands, percent (default: %(default)g)")
+    p.add_argument("--seed", type=int, help="random seed for the bootstrap replicates")
+    p.add_argument("--output", metavar="PREFIX", help="save the IDF matrix, intensity-duration matrix and event table (with duration maxima) to files beginning with this prefix")
+    p.add_argument("--formats", nargs="+", choices=["npz", "csv", "parquet"], default=["npz", "csv"], help="output file formats (default: %(default)s); parquet requires pyarrow")
     p.add_argument("--save_plot", action="store_true", help="save IDF curve to PNG file")
+    p.add_argument("--no_plot", action="store_true", help="do not plot the IDF curve")
+    p.add_argument("--profile", nargs="?", const="idf_profile.json", help="save the wall time, CPU time, peak memory and throughput of each stage to a JSON file (default: %(const)s)")
+    p.add_argument("--trace_memory", action="store_true", help="add the peak traced memory of each stage to the profile (slower)")
+    p.add_argument("--no_jit", action="store_true", help="use the NumPy functions even if Numba is installed")
     p.add_argument("--verbose", action="store_true", help="print out all rainfall events")
     args = p.parse_args()
+    USE_JIT = not args.no_jit
 
-    # If USGS raingage file, convert it:
-    if args.usgs:
-        rain_file = "".join([os.path.splitext(args.file)[0], ".csv"])
-        usgs_to_csv(args.file, rain_file)
-    else:
-        rain_file = args.file
+    cache_dir = args.cache_dir
+    if args.cache and cache_dir is None:
+        cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(args.file)), ".idf_cache")
+    cache_size = int(args.cache_size*2**20)
 
-    if os.path.isfile(rain_file):
+    # Define minimum interevent time (MIT), hours:
+    mit = args.mit
+
+    if not all(math.isfinite(x) for x in args.durations + [mit]):
+        p.error("--durations and --mit must be finite")
+    if not all(math.isfinite(x) for x in args.return_periods):
+        p.error("--return_periods must be finite")
+    if min(args.durations) <= 0:
+        p.error("--durations must be positive")
+    if min(args.return_periods) < 1:
+        p.error("--return_periods must be at least one year")
+    if mit < 0:
+        p.error("--mit must not be negative")
+
+    # Define the durations (minutes) and return periods (years):
+    args.durations = sorted(set(args.durations))
+    args.return_periods = sorted(set(args.return_periods))
+
+    if args.batch:
+        # Process every rain gauge file in a directory (or glob pattern):
+        if os.path.isdir(args.file):
+            rain_files = sorted(glob.glob(os.path.join(args.file, "*")))
+        else:
+            rain_files = sorted(glob.glob(args.file))
+        rain_files = [f for f in rain_files if os.path.isfile(f)]
+        if not rain_files:
+            raise IOError("Could not find input files. Check filename and path.")
+        if args.cache and args.cache_dir is None:
+            cache_dir = os.path.join(
+                os.path.dirname(os.path.abspath(rain_files[0])), ".idf_cache")
+        results, errors = run_batch(
+            rain_files, args.workers, usgs=args.usgs,
+            make_regular=args.make_regular, mit=mit, cache_dir=cache_dir,
+            cache_size=cache_size, is_rate=args.rate,
+            durations=args.durations, return_periods=args.return_periods)
+        write_batch(args.batch_out, results, args.durations,
+                    args.return_periods)
+        print("Processed %d of %d rain gauges; results saved to %s" % (
+            len(results), len(rain_files), args.batch_out))
+        sys.exit(1 if errors else 0)
+
+    if args.serve:
+        # Answer IDF queries for the rainfall files in a directory:
+        host, _, port = args.serve.rpartition(":")
+        serve_idf(
+            args.file, host or "localhost", int(port), args.verbose,
+            usgs=args.usgs, make_regular=args.make_regular,
+            is_rate=args.rate, cache_dir=cache_dir, cache_size=cache_size,
+            durations=args.durations, return_periods=args.return_periods,
+            mit=mit)
+        sys.exit(0)
+
+    profiler = StageProfiler(args.profile is not None, args.trace_memory)
+
+    csv_file = None
+    if args.usgs and not args.no_csv:
+        csv_file = "".join([os.path.splitext(args.file)[0], ".csv"])
+    if args.output and "parquet" in args.formats:
         try:
-            temp = numpy.loadtxt(
-                rain_file,
-                dtype={'names': ('timestamps', 'rain'),
-                       'formats': ('O', 'f4')},
-                delimiter=",",
-                skiprows=1,
-                usecols=(0,1),
-                converters={0: lambda x: string_to_date(x),
-                            1: numpy.float}
-            )
-        except:
-            raise IOError("Could not read the input file. Check your format.")
-    else:
-        raise IOError("Could not find input file. Check filename and path.")
-
-    # Make data into a regular time series (if necessary):
-    data = None
-    if args.make_regular:
-        data = make_regular_ts(temp)
+            get_pyarrow()
+        except ImportError as e:
+            p.error(str(e))
+    if args.chunk_size and args.make_regular:
+        p.error("--make_regular can not be used with --chunk_size")
+    if args.mit_sweep and (args.chunk_size or args.state):
+        p.error("--mit_sweep can not be used with --chunk_size or --state")
+    if args.sparse and (args.chunk_size or args.state or args.mit_sweep):
+        p.error(
+            "--sparse can not be used with --chunk_size, --state or --mit_sweep")
+    if args.grid and (args.chunk_size or args.state or args.mit_sweep or
+                      args.sparse):
+        p.error("--grid can not be used with --chunk_size, --state, "
+                "--mit_sweep or --sparse")
+    if args.grid and args.file.lower().endswith(".npy"):
+        if args.grid_start is None or args.grid_step is None:
+            p.error("--grid with a .npy file requires --grid_start and "
+                    "--grid_step")
+        if not (math.isfinite(args.grid_step) and args.grid_step > 0):
+            p.error("--grid_step must be positive")
+        try:
+            numpy.datetime64(args.grid_start, 's')
+        except ValueError:
+            p.error("--grid_start is not a valid time: %s" % (
+                args.grid_start))
+    if args.series != "events" and (args.chunk_size or args.state or
+                                    args.mit_sweep or args.grid):
+        p.error("--series %s can not be used with --chunk_size, --state, "
+                "--mit_sweep or --grid" % (args.series))
+    if args.series == "ams" and args.sparse:
+        p.error("--series ams can not be used with --sparse")
+    if args.series == "pds" and args.bootstrap > 0:
+        p.error("--series pds can not be used with --bootstrap")
+    if args.tile_size is not None and args.tile_size < 1:
+        p.error("--tile_size must be at least one cell")
+
+    if args.grid:
+        # Compute the IDF matrix of every grid cell:
+        with profiler.stage('calc_grid_idf') as my_stage:
+            timestamps, cube = load_grid(
+                args.file, args.grid_var, args.grid_start, args.grid_step)
+            idf, num_events = calc_grid_idf(
+                timestamps, cube, args.durations, args.return_periods, mit,
+                args.rate, args.tile_size)
+            my_stage['rows'] = len(timestamps)*len(num_events)
+            my_stage['events'] = int(num_events.sum())
+        out_file = "%s_grid.npz" % (args.output or "idf")
+        numpy.savez(out_file, idf=idf, num_events=num_events,
+                    grid_shape=numpy.array(cube.shape[1:]),
+                    durations=numpy.array(args.durations),
+                    return_periods=numpy.array(args.return_periods))
+        print("Computed %d grid cells (%d rain events); results saved to %s" % (
+            len(num_events), num_events.sum(), out_file))
+        if args.profile is not None:
+            profiler.stop()
+            profiler.save(args.profile, file=args.file,
+                          num_rows=len(timestamps))
+        sys.exit(0)
+
+    durations = args.durations
+    if args.state or args.chunk_size:
+        # Update the saved (or new) rain events and their maxima with the
+        # new samples:
+        if args.state and os.path.isfile(args.state):
+            try:
+                state = IncrementalIDF.load(args.state)
+            except (OSError, ValueError, KeyError) as e:
+                p.error("could not read state file %s: %s" % (args.state, e))
+            if (state.durations != list(durations) or
+                    state.mit != mit or state.is_rate != args.rate):
+                p.error(
+                    "state file %s was saved with --durations %s --mit %g%s; "
+                    "use the same settings or a new state file" % (
+                        args.state, " ".join("%g" % (d)
+                                             for d in state.durations),
+                        state.mit, " --rate" if state.is_rate else ""))
+        else:
+            state = IncrementalIDF(durations, mit, args.rate)
+        num_samples = state.num_samples
+
+    sparse = None
+    if args.chunk_size:
+        # Stream the file in chunks without loading the whole record:
+        with profiler.stage('append_chunks') as my_stage:
+            first_event = state.append_file(
+                args.file, args.usgs, csv_file, args.chunk_size)
+            my_stage['rows'] = state.num_samples - num_samples
+            my_stage['events'] = len(state.events) - first_event
+    elif args.sparse and not args.make_regular and cache_dir is None:
+        # Keep only the nonzero samples of the regular time series, reading
+        # the file in chunks (small enough that parsing a chunk takes less
+        # memory than a mostly dry series):
+        with profiler.stage('make_sparse') as my_stage:
+            sparse = SparseSeries.from_chunks(
+                iter_rainfall(args.file, args.usgs, csv_file,
+                              CHUNK_SIZE//10))
+            my_stage['rows'] = sparse.num_samples
     else:
-        data = temp
-
-    # Define total number of lines read:
-    numtotal = data.shape[0]
-
-    # Define minimum interevent time (MIT), hours:
-    mit = 5
-
-    # Initialize last heard tracker & rain event counter:
-    lastheard = data['timestamps'][0] - datetime.timedelta(hours=mit+1)
-    rainevent = 1
-
-    # Filter rainfalls and create storm event objects:
-    for i in range(1, numtotal):
-        if data['rain'][i] > 0 and data['rain'][i-1] == 0:
-            # This is the start of a rain event!
-
-            # Save the start time for the storm event:
-            stormstart = data['timestamps'][i]
-
-            # Check to see if the MIT requirement is met:
-            delta_t = (stormstart - lastheard).total_seconds()/3600.0
-
-            if delta_t <= mit:
-                # Found a short break in the storm; still in previous event:
-                rainevent -= 1
-                if args.verbose:
-                    print("Still in event %d: %s, last heard %0.3f hrs" % (
-                        rainevent, stormstart, delta_t))
-
-                # Include the starting zero event:
-                tprev = data['timestamps'][i-1]
-                rprev = data['rain'][i-1]
-                exec((
-                    "if Event%d.time[-1] != tprev:\n"
-                    "    Event%d.time.append(data['timestamps'][i-1])\n"
-                    "    Event%d.rain.append(data['rain'][i-1])\n"
-                    ) % (rainevent, rainevent, rainevent))
-
-                # Initialize the current rain events rainfall amount:
-                eventrain = data['rain'][i]
-
-                # Initialize the iterater:
-                j = 0
-
-                while (eventrain > 0):
-                    # Save the time and rain amounts for the event:
-                    exec("Event%d.time.append(data['timestamps'][i+j])" % (
-                        rainevent))
-                    exec("Event%d.rain.append(data['rain'][i+j])" % (
-                        rainevent))
-
-                    # Increment the iterater & update event rainfall:
-                    j += 1
-                    eventrain = data['rain'][i+j]
-
-                # Include the ending zero event:
-                exec("Event%d.time.append(data['timestamps'][i+j])" % (
-                    rainevent))
-                exec("Event%d.rain.append(data['rain'][i+j])" % (
-                    rainevent))
-
-                # Update lastheard date:
-                exec("lastheard = Event%d.time[-1]" % (rainevent))
-
-                # Increment the event couter:
-                rainevent += 1
-
+        with profiler.stage('load_rainfall') as my_stage:
+            data = load_rainfall(args.file, args.usgs,
+                                 args.make_regular and not args.sparse,
+                                 csv_file, cache_dir, cache_size)
+            my_stage['rows'] = len(data)
+
+    if args.sparse and sparse is None:
+        # Keep only the nonzero samples of the regular time series (the
+        # loaded samples are no longer needed):
+        with profiler.stage('make_sparse', rows=len(data)):
+            if args.make_regular:
+                sparse = make_sparse_regular_ts(data)
             else:
-                if args.verbose:
-                    print("Start rain event %d: %s, last heard %0.3f hrs" % (
-                        rainevent, stormstart, delta_t))
-
-                # Initialize event object arrays:
-                # Note, set the rainfall rate boolean here
-                exec("Event%d = PrecipEvent(is_rate=%s)" % (rainevent, False))
-
-                # Include the starting zero event:
-                exec("Event%d.time.append(data['timestamps'][i-1])" % (
-                    rainevent))
-                exec("Event%d.rain.append(data['rain'][i-1])" % (
-                    rainevent))
-
-                # Initialize the current rain events rainfall amount:
-                eventrain = data['rain'][i]
-
-                # Initialize the iterater:
-                j = 0
-
-                while (eventrain > 0):
-                    # Save the time and rain amounts for the event:
-                    exec("Event%d.time.append(data['timestamps'][i+j])" % (
-                        rainevent))
-                    exec("Event%d.rain.append(data['rain'][i+j])" % (
-                        rainevent))
-
-                    # Increment the iterater & update event rainfall:
-                    j += 1
-                    eventrain = data['rain'][i+j]
-
-                # Include the ending zero event:
-                exec("Event%d.time.append(data['timestamps'][i+j])" % (
-                    rainevent))
-                exec("Event%d.rain.append(data['rain'][i+j])" % (
-                    rainevent))
-
-                # Update lastheard date:
-                exec("lastheard = Event%d.time[-1]" % (rainevent))
-
-                # Increment the event couter:
-                rainevent += 1
-
-    all_durations = []
-    # Calculate event totals:
-    for i in range(1, rainevent):
-        exec("Event%d.calc_total_rain()" % (i))
-        exec("Event%d.calc_duration()" % (i))
-        exec("all_durations.append(Event%d.duration)" % (i))
-        if args.verbose:
+                sparse = SparseSeries.from_dense(data)
+        del data
+
+    if args.mit_sweep:
+        # Compute the IDF matrix for each MIT:
+        with profiler.stage('compute_idf_sweep', rows=len(data)):
+            results = compute_idf_sweep(
+                data['timestamps'], data['rain'], args.mit_sweep, durations,
+                args.return_periods, args.rate)
+        write_batch(args.sweep_out, results, durations, args.return_periods,
+                    key_name="mit_hr")
+        print("Computed %d MITs; results saved to %s" % (
+            len(results), args.sweep_out))
+        if args.profile is not None:
+            profiler.stop()
+            profiler.save(args.profile, file=args.file, num_rows=len(data))
+        sys.exit(0)
+
+    if args.state or args.chunk_size:
+        if not args.chunk_size:
+            with profiler.stage('append_state', rows=len(data)) as my_stage:
+                first_event = state.append(data)
+                my_stage['events'] = len(state.events) - first_event
+        if args.state:
+            state.save(args.state)
+        num_rows = state.num_samples - num_samples
+        events = state.events
+        event_times = state.event_times
+        maxima = state.maxima
+    elif args.series == "ams":
+        # Find each year's maximum rainfall for each duration (min), rather
+        # than the rain events:
+        num_rows = len(data)
+        with profiler.stage('calc_annual_maxima', rows=num_rows) as my_stage:
+            first_event = 0
+            seconds = to_seconds(data['timestamps'])
+            cum_rain = cumulative_rain(data['rain'], seconds, args.rate)
+            events, maxima = calc_annual_maxima(
+                data['timestamps'], cum_rain, durations)
+            event_times = numpy.stack(
+                (data['timestamps'][events['start']],
+                 data['timestamps'][events['end']]), axis=1)
+            my_stage['events'] = len(events)
+    elif args.sparse:
+        # Find the rain events among the nonzero samples:
+        num_rows = sparse.num_samples
+        with profiler.stage('find_events', rows=num_rows) as my_stage:
+            first_event = 0
+            events = find_sparse_events(sparse, mit, args.rate)
+            event_times = numpy.stack(
+                (sparse.timestamps(events['start']),
+                 sparse.timestamps(events['end'])), axis=1)
+            my_stage['events'] = len(events)
+    else:
+        # Find the rain events:
+        num_rows = len(data)
+        with profiler.stage('find_events', rows=num_rows) as my_stage:
+            first_event = 0
+            seconds = to_seconds(data['timestamps'])
+            events = find_events(seconds, data['rain'], mit, args.rate)
+            event_times = numpy.stack(
+                (data['timestamps'][events['start']],
+                 data['timestamps'][events['end']]), axis=1)
+            my_stage['events'] = len(events)
+
+    if args.verbose:
+        for i in range(first_event, len(events)):
             print(
                 "%02d %s -- %s  (%6.2f hours); %6.2f inches" % (
-                    i,
-                    eval("Event%d.time[0]" % (i)),
-                    eval("Event%d.time[-1]" % (i)),
-                    eval("Event%d.duration" % (i)),
-                    eval("Event%d.total_rain" % (i))
+                    i + 1,
+                    event_times[i, 0],
+                    event_times[i, 1],
+                    events['duration'][i],
+                    events['total'][i]
                     )
             )
 
-    maxduration = numpy.array(all_durations).max()
-
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
     # IDF ANALYSIS
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
-    # Define durations (min) for analyzing:
-    durations = [5, 15, 30, 60, 120, 180, 720, 1440]
-    num_durs = len(durations)
-
-    # Initialize all event IDF durations and rainfalls:
-    for i in range(1, rainevent):
-        exec("Event%d.IDFdurations = numpy.array(durations)" % (i))
-        exec("Event%d.IDFrainfalls = numpy.zeros(num_durs)" % (i))
-
-    for n in range(num_durs):
-        curdur = durations[n]/60.0  # current duration in hours
-
-        # Initialize event list:
-        exec("all%dMINevents = numpy.zeros(rainevent-1)" % (durations[n]))
-
-        # Iterate over each rain event
-        for j in range(1, rainevent):
-            # Save the total rain event time (in hours) & event points:
-            eventtime = eval("Event%d.duration" % (j))
-            eventpoints = eval("Event%d.points" % (j))
-
-            # Initialize a max value at the beginning of the event:
-            eventDmax = 0
-
-            # Check the rain event duration:
-            if eventtime <= curdur:
-                # Rain event was less than the duration, set equal to total:
-                exec("Event%d.calc_total_rain()" % (j))
-                eventDmax = eval("copy(Event%d.total_rain)" % (j))
-                exec("Event%d.IDFrainfalls[%d] = copy(eventDmax)" % (j, n))
+    # Find each event's maximum rainfall for each duration (min):
+    if args.sparse:
+        with profiler.stage('calc_duration_maxima', rows=num_rows,
+                            events=len(events)):
+            maxima = calc_sparse_maxima(sparse, events, durations, args.rate)
+    elif not (args.state or args.chunk_size or args.series == "ams"):
+        with profiler.stage('calc_duration_maxima', rows=num_rows,
+                            events=len(events)):
+            cum_rain = cumulative_rain(data['rain'], seconds, args.rate)
+            if args.workers is None or args.workers == 1:
+                maxima = calc_duration_maxima(seconds, cum_rain, events,
+                                              durations, args.rate)
             else:
-                # The event was longer than duration, search through the event
-                # to find the event max.
-
-                # Iterate through the event with a moving window, where the
-                # starting index is eventDa.
-                all_events = []
-                for eventDa in range(eventpoints-2):
-                    # Find the ending index that corresponds to the current
-                    # duration. Start by setting the end index to one larger
-                    # than the start point
-                    eventDe = eventDa+1
-                    eventDdurn = eval(
-                        ("(Event%d.time[eventDe] - "
-                         "Event%d.time[eventDa]).total_seconds()/3600.0"
-                         ) % (j, j))
-                    while eventDdurn <= curdur:
-                        # Set a break condition if we've reached the end of the
-                        # rainfall time series:
-                        if eventDe > eventpoints-1:
-                            break
-
-                        # Update event duration (eventDdurn):
-                        eventDdurn = eval(
-                            ("(Event%d.time[eventDe] - "
-                             "Event%d.time[eventDa]).total_seconds()/3600.0"
-                             ) % (j, j))
-                        eventDe += 1
-
-                    # Calculate the duration rainfall amount:
-                    exec("Event%d.calc_total_rain(%d, %d)" % (
-                        j, eventDa, eventDe-1))
-                    eventDrain = eval("copy(Event%d.total_rain)" % (j))
-                    all_events.append(eventDrain)
-
-                # Define the duration (hr) storm as the maximum:
-                eventDmax = numpy.array(all_events).max()
-                exec("Event%d.IDFrainfalls[%d] = copy(eventDmax)" % (j, n))
-
-            # Save the event total:
-            exec("all%dMINevents[%d] = eventDmax" % (durations[n], j-1))
+                maxima = calc_parallel_maxima(seconds, cum_rain, events,
+                                              durations, args.rate,
+                                              args.workers)
 
 
     # ~~~~~~~~~~~~~~~
     # IDF PROBABILITY
     # ~~~~~~~~~~~~~~~
     # Create the intensity-duration matrix (3 x durations)
-    #   row 1 = duration (min)
-    #   row 2 = max rainfall amount (in)
-    #   row 3 = associated rainfall intensity (in/hr)
-    idc = numpy.zeros(shape=(3, num_durs))
-
-    for d in range(num_durs):
-        # Calculate the maximum rainfall amounts for each duration:
-        exec("max%dMINrain = all%dMINevents.max()" % (
-            durations[d], durations[d]))
-
-        # Put together the IDC curve matrix:
-        idc[0, d] = durations[d]  # duration length (min)
-        idc[1, d] = eval("max%dMINrain" % (durations[d]))  # precip (in)
-        idc[2, d] = idc[1, d]/(durations[d]/60.0)  # intensity (in/hr)
-
-        # Convert events to integers for histogram to work with reason.
-        exec("all%dMINints = [int(1000*i) for i in all%dMINevents]" % (
-            durations[d], durations[d]))
-
-        # Determine PDF for each discrete rainfall amount:
-        exec("b%dMIN = sorted(list(set(all%dMINints)))" % (
-            durations[d], durations[d]))
-        exec("my_bins = numpy.bincount(all%dMINints)" % (durations[d]))
-        exec("f%dMIN = [my_bins[i] for i in b%dMIN]" % (
-            durations[d], durations[d]))
-        exec("my%dpdf = [float(i)/(rainevent - 1) for i in f%dMIN]" % (
-            durations[d], durations[d]))
-        my_bins = numpy.array([])
-
-        # Compute the CPF:
-        exec("my%dcpf = numpy.zeros(len(my%dpdf))" % (
-            durations[d], durations[d]))
-        exec("my%dcpf[0] = my%dpdf[0]" % (durations[d], durations[d]))
-        exec(("for k in range(1, len(my%dpdf)):\n"
-              "    my%dcpf[k] = my%dcpf[k-1] + my%dpdf[k]\n"
-              ) % (durations[d], durations[d], durations[d], durations[d]))
-
-
-    # ~~~~~~~~~~~~~~~~~
-    # COMPUTE IDF CURVE
-    # ~~~~~~~~~~~~~~~~~
-    # IDF matrix:
-    # -------------------------------------------------------------------- #
-    #                               F R E Q U E N C Y
-    #                    2-yr   5-yr   10-yr   25-yr   50-yr   100-yr
-    # D     5-min ....                                               .....
-    # U    15-min ....                                               .....
-    # R    30-min ....       RAIN INTENSITIES CORRESPONDING          .....
-    # A    60-min ....             TO THE RETURN PERIOD              .....
-    # T   120-min ....                  PROBABILITY                  .....
-    # I   180-min ....                                               .....
-    # O   720-min ....                                               .....
-    # N  1440-min ....                                               .....
-    # -------------------------------------------------------------------- #
-
-    # Define the return periods (myfreqT) and their CDF equivalents:
-    myfreqT = [2, 5, 10, 25, 50, 100]
-    myfreqs = [0.50, 0.80, 0.90, 0.96, 0.98, 0.99]
-
-    idf = numpy.zeros(shape=(len(durations), len(myfreqs)))
-
-    # Calculate the rainfall intensity (in/hr) for each return period
-    # probability, using linear interpolation. Remember to scale down the
-    # rainfall.
-    for d in range(num_durs):
-        for q in range(len(myfreqs)):
-            p = myfreqs[q]
-            idf[d][q] = eval((
-                "(60*1e-3/durations[d])*numpy.interp(p, my%dcpf, b%dMIN)"
-                ) % (durations[d], durations[d]))
+    with profiler.stage('calc_idf', events=len(events)):
+        idc = calc_idc(maxima, durations)
+
+
+        # ~~~~~~~~~~~~~~~~~
+        # COMPUTE IDF CURVE
+        # ~~~~~~~~~~~~~~~~~
+        # Define the return periods (myfreqT):
+        myfreqT = args.return_periods
+        if args.series == "pds":
+            # Average number of peaks per year over the record:
+            if args.sparse:
+                num_years = (sparse.num_samples - 1)*sparse.step
+            else:
+                num_years = numpy.ptp(to_seconds(data['timestamps']))
+            num_years /= 365.25*86400.0
+            idf = calc_pds_idf(maxima, durations, myfreqT, num_years,
+                               args.threshold)
+            if numpy.isnan(idf).any():
+                print("Warning: IDF is undefined (NaN) where fewer than one "
+                      "peak above the threshold is expected per return "
+                      "period (L*T < 1)")
+        else:
+            idf = calc_idf(maxima, durations, myfreqT)
+
+    if args.bootstrap > 0:
+        # Confidence bands of the rainfall intensities:
+        with profiler.stage('calc_idf_bands', events=len(events)):
+            idf_bands = calc_idf_bands(maxima, durations, myfreqT,
+                                       args.bootstrap, args.ci, args.seed,
+                                       args.workers)
+        print("%g%% confidence bands (%d bootstrap replicates), in/hr:" % (
+            args.ci, args.bootstrap))
+        for i in range(len(durations)):
+            for j in range(len(myfreqT)):
+                print("%5g-min %4g-yr: %8.4f  [%8.4f, %8.4f]" % (
+                    durations[i], myfreqT[j], idf[i, j],
+                    idf_bands[0, i, j], idf_bands[1, i, j]))
 
     # ~~~~~~~~~~~~~~
     # PLOT IDF CURVE
     # ~~~~~~~~~~~~~~
-    my_labels = [(str(i) + "-yr") for i in myfreqT]
-    durations = numpy.array(durations)
-    make_plot(idf, durations, my_labels, args.save_plot)
+    if args.output:
+        with profiler.stage('save_results', events=len(events)):
+            out_files = save_results(args.output, idf, idc, events, maxima,
+                                     durations, myfreqT, event_times,
+                                     args.formats)
+        print("Results saved to %s" % (", ".join(out_files)))
+
+    if not args.no_plot:
+        my_labels = ["%g-yr" % (i) for i in myfreqT]
+        durations = numpy.array(durations)
+        with profiler.stage('make_plot'):
+            make_plot(idf, durations, my_labels, args.save_plot)
+
+    if args.profile is not None:
+        profiler.stop()
+        profiler.save(args.profile, file=args.file,
+                      num_rows=num_rows, num_events=len(events))
+        print("Profile saved to %s" % (args.profile))
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+#
+# test_idf.py
+#
+# VERSION: 0.5.0-dev
+#
+# LAST EDIT: 2026-10-17
+#
+###############################################################################
+# PUBLIC DOMAIN NOTICE                                                        #
+###############################################################################
+# This software is freely available to the public for use.                    #
+#                                                                             #
+# Although all reasonable efforts have been taken to ensure the accuracy and  #
+# reliability of the software, the author does not and cannot warrant the     #
+# performance or results that may be obtained by using this software.         #
+# The author disclaims all warranties, express or implied, including          #
+# warranties of performance, merchantability or fitness for any particular    #
+# purpose.                                                                    #
+#                                                                             #
+# Please cite the author in any work or product based on this material.       #
+#    Tyler W. Davis                                                           #
+###############################################################################
+#
+###############################################################################
+# REQUIRED MODULES:
+###############################################################################
+import unittest
+
+import numpy
+
+import idf
+
+
+###############################################################################
+# FUNCTIONS:
+###############################################################################
+def make_series(num_samples, step, seed, irregular=False):
+    """
+    Name:     make_series
+    Input:    - int, number of samples (num_samples)
+              - int, time step, seconds (step)
+              - int, random seed (seed)
+              - bool, drop random samples to make the series irregular
+                (irregular)
+    Output:   tuple, epoch seconds and rainfall
+    Features: Returns a synthetic rainfall series of showers separated by
+              dry spells of random length
+    """
+    rng = numpy.random.default_rng(seed)
+    seconds = step*numpy.arange(num_samples, dtype=numpy.int64)
+    rain = rng.exponential(0.05, num_samples)
+    rain[rng.random(num_samples) < 0.6] = 0.0
+    for my_start in rng.integers(0, num_samples, num_samples//100):
+        rain[my_start:my_start + rng.integers(10, 200)] = 0.0
+    if irregular:
+        keep = rng.random(num_samples) < 0.7
+        seconds = seconds[keep]
+        rain = rain[keep]
+    return (seconds, rain)
+
+
+def original_maxima(seconds, rain, events, durations, is_rate=False):
+    """
+    Name:     original_maxima
+    Input:    - numpy.ndarray, epoch seconds (seconds)
+              - numpy.ndarray, rainfall (rain)
+              - numpy.ndarray, event table (events)
+              - list, durations, minutes (durations)
+              - bool, rainfall data are rates, in/hr (is_rate)
+    Output:   numpy.ndarray, maximum rainfall for each event and duration
+    Features: Returns the duration maxima of the original (v0.4.3) moving
+              window, a literal port of its loop over PrecipEvent lists:
+              each event lists its wet samples and the dry samples next to
+              them (not the dry samples between two dry ones)
+    """
+    rain = numpy.where(rain > 0, rain, 0.0)
+    maxima = numpy.zeros((len(events), len(durations)))
+    for e, (first, last, duration, total) in enumerate(events):
+        my_list = [i for i in range(first, last + 1)
+                   if rain[i] > 0 or (i < last and rain[i + 1] > 0) or
+                   (i > first and rain[i - 1] > 0)]
+        times = seconds[my_list]
+        amounts = rain[my_list]
+        points = len(my_list)
+
+        def calc_total_rain(m, n):
+            if m == n:
+                return 0.0
+            elif is_rate:
+                total_rain = 0.0
+                for i in range(m, n):
+                    delta_t = (times[i + 1] - times[i])/3600.0
+                    total_rain += 0.5*(amounts[i] + amounts[i + 1])*delta_t
+                return total_rain
+            else:
+                return amounts[m:n].sum()
+
+        for n in range(len(durations)):
+            curdur = durations[n]/60.0
+            if duration <= curdur or points < 3:
+                maxima[e, n] = calc_total_rain(0, points - 1)
+                continue
+            all_events = []
+            for eventDa in range(points - 2):
+                eventDe = eventDa + 1
+                eventDdurn = (times[eventDe] - times[eventDa])/3600.0
+                while eventDdurn <= curdur:
+                    if eventDe > points - 1:
+                        break
+                    eventDdurn = (times[eventDe] - times[eventDa])/3600.0
+                    eventDe += 1
+                all_events.append(calc_total_rain(eventDa, eventDe - 1))
+            maxima[e, n] = max(all_events)
+    return maxima
+
+
+###############################################################################
+# CLASSES:
+###############################################################################
+class TestBackends(unittest.TestCase):
+    """
+    Name:     TestBackends
+    Features: Compares the duration maxima of the sequential kernel with
+              those of the NumPy functions
+    History:  Version 0.5.0
+              - created [26.10.17]
+    """
+    # Unsorted, with durations below, at and above the time steps:
+    durations = [60, 1, 5, 7.5, 15, 180, 10, 1440]
+
+    def setUp(self):
+        self.use_jit = idf.USE_JIT
+        self.jit_kernels = dict(idf.JIT_KERNELS)
+
+    def tearDown(self):
+        idf.USE_JIT = self.use_jit
+        idf.JIT_KERNELS.clear()
+        idf.JIT_KERNELS.update(self.jit_kernels)
+
+    def check_backends(self, seconds, rain, is_rate=False):
+        """
+        Name:     TestBackends.check_backends
+        Input:    - numpy.ndarray, epoch seconds (seconds)
+                  - numpy.ndarray, rainfall (rain)
+                  - bool, rainfall data are rates, in/hr (is_rate)
+        Output:   None
+        Features: Asserts that both backends find the same maxima
+        """
+        cum_rain = idf.cumulative_rain(rain, seconds, is_rate)
+        events = idf.find_events(seconds, rain, 1.0, is_rate)
+        self.assertGreater(len(events), 10)
+
+        idf.USE_JIT = False
+        numpy_maxima = idf.calc_duration_maxima(
+            seconds, cum_rain, events, self.durations, is_rate)
+
+        idf.USE_JIT = True
+        idf.JIT_KERNELS.clear()
+        idf.JIT_KERNELS['scan_window_maxima'] = idf.scan_window_maxima
+        kernel_maxima = idf.calc_duration_maxima(
+            seconds, cum_rain, events, self.durations, is_rate)
+
+        numpy.testing.assert_array_equal(kernel_maxima, numpy_maxima)
+
+    def test_regular(self):
+        for step in (60, 300, 600):
+            seconds, rain = make_series(5000, step, step)
+            self.check_backends(seconds, rain)
+
+    def test_irregular(self):
+        seconds, rain = make_series(5000, 300, 1, irregular=True)
+        self.check_backends(seconds, rain)
+
+    def test_rate(self):
+        seconds, rain = make_series(5000, 300, 2)
+        self.check_backends(seconds, rain, is_rate=True)
+        seconds, rain = make_series(5000, 300, 3, irregular=True)
+        self.check_backends(seconds, rain, is_rate=True)
+
+
+class TestOriginal(unittest.TestCase):
+    """
+    Name:     TestOriginal
+    Features: Compares the duration maxima of both backends with those of
+              the original moving window, including merged events (i.e.,
+              wet runs with dry gaps) and durations below the time step
+    History:  Version 0.5.0
+              - created [26.10.17]
+    """
+    durations = [1, 5, 7.5, 15, 60]
+
+    def setUp(self):
+        self.use_jit = idf.USE_JIT
+        self.jit_kernels = dict(idf.JIT_KERNELS)
+
+    def tearDown(self):
+        idf.USE_JIT = self.use_jit
+        idf.JIT_KERNELS.clear()
+        idf.JIT_KERNELS.update(self.jit_kernels)
+
+    def check_original(self, seconds, rain, is_rate=False):
+        """
+        Name:     TestOriginal.check_original
+        Input:    - numpy.ndarray, epoch seconds (seconds)
+                  - numpy.ndarray, rainfall (rain)
+                  - bool, rainfall data are rates, in/hr (is_rate)
+        Output:   None
+        Features: Asserts that both backends find the original maxima
+        """
+        cum_rain = idf.cumulative_rain(rain, seconds, is_rate)
+        events = idf.find_events(seconds, rain, 1.0, is_rate)
+        expected = original_maxima(
+            seconds, rain, events, self.durations, is_rate)
+        for use_jit in (False, True):
+            idf.USE_JIT = use_jit
+            idf.JIT_KERNELS.clear()
+            idf.JIT_KERNELS['scan_window_maxima'] = idf.scan_window_maxima
+            numpy.testing.assert_allclose(
+                idf.calc_duration_maxima(
+                    seconds, cum_rain, events, self.durations, is_rate),
+                expected, rtol=1e-9, atol=1e-12)
+
+    def test_regular(self):
+        for step in (60, 300):
+            seconds, rain = make_series(2000, step, 4)
+            self.check_original(seconds, rain)
+            self.check_original(seconds, rain, is_rate=True)
+
+    def test_irregular(self):
+        for step, seed in ((60, 8), (300, 5)):
+            seconds, rain = make_series(3000, step, seed, irregular=True)
+            self.check_original(seconds, rain)
+
+    def test_irregular_rate(self):
+        # Windows must not start inside the dry gaps of merged events:
+        for step, seed in ((60, 8), (60, 9), (300, 5), (300, 6)):
+            seconds, rain = make_series(3000, step, seed, irregular=True)
+            self.check_original(seconds, rain, is_rate=True)
+
+
+class TestIncremental(unittest.TestCase):
+    """
+    Name:     TestIncremental
+    Features: Compares the rain events and duration maxima of a record
+              appended in random chunks with those of the whole record
+    History:  Version 0.5.0
+              - created [26.10.17]
+    """
+    durations = [1, 5, 15, 60, 180, 1440]
+
+    def check_chunks(self, seconds, rain, is_rate=False, num_cuts=30):
+        """
+        Name:     TestIncremental.check_chunks
+        Input:    - numpy.ndarray, epoch seconds (seconds)
+                  - numpy.ndarray, rainfall (rain)
+                  - bool, rainfall data are rates, in/hr (is_rate)
+                  - int, number of random cuts (num_cuts)
+        Output:   None
+        Features: Asserts that appending the record in chunks finds the same
+                  events and maxima as the whole record
+        """
+        data = numpy.zeros(len(seconds), dtype=idf.RAIN_DTYPE)
+        data['timestamps'] = seconds.astype('datetime64[s]')
+        data['rain'] = rain
+        cum_rain = idf.cumulative_rain(rain, seconds, is_rate)
+        events = idf.find_events(seconds, rain, 1.0, is_rate)
+        maxima = idf.calc_duration_maxima(
+            seconds, cum_rain, events, self.durations, is_rate)
+        self.assertGreater(len(events), 10)
+
+        rng = numpy.random.default_rng(len(seconds))
+        cuts = numpy.sort(rng.integers(0, len(data), num_cuts))
+        state = idf.IncrementalIDF(self.durations, 1.0, is_rate)
+        for my_chunk in numpy.split(data, cuts):
+            state.append(my_chunk)
+
+        self.assertEqual(state.num_samples, len(data))
+        numpy.testing.assert_array_equal(state.events['start'],
+                                         events['start'])
+        numpy.testing.assert_array_equal(state.events['end'], events['end'])
+        numpy.testing.assert_allclose(state.events['duration'],
+                                      events['duration'])
+        numpy.testing.assert_allclose(state.events['total'], events['total'],
+                                      rtol=1e-9, atol=1e-12)
+        numpy.testing.assert_allclose(state.maxima, maxima,
+                                      rtol=1e-9, atol=1e-12)
+
+    def test_regular(self):
+        seconds, rain = make_series(5000, 300, 10)
+        self.check_chunks(seconds, rain)
+        self.check_chunks(seconds, rain, is_rate=True)
+
+    def test_irregular(self):
+        seconds, rain = make_series(5000, 300, 11, irregular=True)
+        self.check_chunks(seconds, rain)
+        self.check_chunks(seconds, rain, is_rate=True)
+
+
+class TestParser(unittest.TestCase):
+    """
+    Name:     TestParser
+    Features: Checks the signs, timestamps and invalid dates and times read
+              by parse_rainfall_lines
+    History:  Version 0.5.0
+              - created [26.10.17]
+    """
+    def parse(self, lines):
+        """
+        Name:     TestParser.parse
+        Input:    list, two-column text lines (lines)
+        Output:   numpy.ndarray, rainfall time series
+        Features: Parses lines in the timestamp format of the first line
+        """
+        return idf.parse_rainfall_lines(
+            lines, idf.get_timestamp_format(lines[0]))
+
+    def test_signs(self):
+        # Minus signs after the comma, with or without whitespace, and in
+        # exponents:
+        my_data = self.parse(["2020-01-01 00:05,-0.5\n",
+                              "2020-01-01 00:10, -1\n",
+                              "2020-01-01 00:15,\t-1e-2\n",
+                              "2020-01-01 00:20,  2.5E-1\n"])
+        numpy.testing.assert_array_equal(
+            my_data['rain'], [-0.5, -1.0, -0.01, 0.25])
+
+    def test_timestamps(self):
+        my_data = self.parse(["02/29/2020 23:59:30, 1\n",
+                              "03/01/2020 00:00:00, 2\n"])
+        numpy.testing.assert_array_equal(
+            my_data['timestamps'],
+            numpy.array(['2020-02-29T23:59:30', '2020-03-01T00:00:00'],
+                        dtype='datetime64[s]'))
+
+    def test_invalid(self):
+        for my_line in ("2020-02-30 00:00,1\n",     # February 30
+                        "2021-02-29 00:00,1\n",     # not a leap year
+                        "2020-04-31 00:00,1\n",
+                        "2020-13-01 00:00,1\n",
+                        "2020-01-01 24:00,1\n",
+                        "2020-01-01 00:60,1\n",
+                        "2020-01-01 00:00:60,1\n",  # seconds > 59
+                        "01/01/2020 00:00:75,1\n"):
+            with self.assertRaises(ValueError):
+                self.parse([my_line])
+
+
+###############################################################################
+# MAIN:
+###############################################################################
+if __name__ == '__main__':
+    unittest.main()